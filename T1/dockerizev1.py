@@ -43,18 +43,37 @@ Usage Examples:
 
   8) Show additional recommendations:
        python3 ccdc_docker_hardener_expanded_os.py --action recommendations
+
+  9) Pin service images to their current registry digests (service_digests.json):
+       python3 ccdc_docker_hardener_expanded_os.py --action refresh-digests
 """
 
 import sys
 import platform
 import subprocess
 import argparse
+import concurrent.futures
+import functools
+import http.client
+import json
 import os
-import shutil
+import shlex
+import socket
+import types
+import urllib.parse
+
+# Host platform, computed once instead of re-probed at each call site.
+IS_WINDOWS = sys.platform == "win32"
+IS_LINUX = sys.platform.startswith("linux")
 
 ###############################################################################
 # 1. Prerequisite Checks
 ###############################################################################
+# Filled in by check_docker() so later actions don't re-run `docker --version`.
+_DOCKER_VERSION = None
+# Set once check_all_dependencies() has run.
+_CHECKED = False
+
 def check_python_version(min_major=3, min_minor=7):
     """Ensure we run on at least Python 3.7."""
     if sys.version_info < (min_major, min_minor):
@@ -63,81 +82,254 @@ def check_python_version(min_major=3, min_minor=7):
     else:
         print(f"[INFO] Python version check passed ({sys.version_info.major}.{sys.version_info.minor}).")
 
-def check_docker():
-    """Check that Docker is installed."""
+# (name, command) pairs probed by probe_tools(); WSL only matters on Windows.
+_TOOL_PROBES = [("docker", "docker --version"), ("compose", "docker-compose --version")]
+if IS_WINDOWS:
+    _TOOL_PROBES.append(("wsl", "wsl --version"))
+_PROBE_MARKER = "__dockerize_rc__"
+
+def probe_tools():
+    """
+    Run all the `--version` probes in a single shell instead of one process each.
+    Returns {name: (exit_code, output)}, or None if the shell couldn't be started.
+    """
+    if IS_WINDOWS:
+        # /v:on so !errorlevel! is read after each command, not when the line is parsed.
+        script = " & ".join(f"{cmd} 2>&1 & echo {_PROBE_MARKER}!errorlevel!" for _, cmd in _TOOL_PROBES)
+        argv = ["cmd.exe", "/v:on", "/c", script]
+    else:
+        script = "; ".join(f"{cmd} 2>&1; echo {_PROBE_MARKER}$?" for _, cmd in _TOOL_PROBES)
+        argv = ["sh", "-c", script]
     try:
-        subprocess.check_call(["docker", "--version"], stdout=subprocess.DEVNULL)
+        out = subprocess.run(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             universal_newlines=True).stdout
+    except OSError:
+        return None
+    results = {}
+    names = iter(name for name, _ in _TOOL_PROBES)
+    lines = []
+    for line in out.splitlines():
+        if line.startswith(_PROBE_MARKER):
+            try:
+                code = int(line[len(_PROBE_MARKER):].strip())
+            except ValueError:
+                code = 1
+            results[next(names, None)] = (code, "\n".join(lines).strip())
+            lines = []
+        else:
+            lines.append(line)
+    return results
+
+def check_docker(probe=None):
+    """Check that Docker is installed (and remember its version string)."""
+    global _DOCKER_VERSION
+    try:
+        if probe is None:
+            _DOCKER_VERSION = subprocess.check_output(["docker", "--version"], stdin=subprocess.DEVNULL).decode("utf-8").strip()
+        elif probe[0] == 0:
+            _DOCKER_VERSION = probe[1]
+        else:
+            raise RuntimeError(probe[1])
         print("[INFO] Docker is installed.")
     except Exception:
         print("[ERROR] Docker not found. Please install Docker before running this script.")
         sys.exit(1)
 
-def check_docker_compose():
+def check_docker_compose(probe=None):
     """Check if Docker Compose is installed (warn if not)."""
     try:
-        subprocess.check_call(["docker-compose", "--version"], stdout=subprocess.DEVNULL)
+        if probe is None:
+            subprocess.check_call(["docker-compose", "--version"], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        elif probe[0] != 0:
+            raise RuntimeError(probe[1])
         print("[INFO] Docker Compose is installed.")
     except Exception:
         print("[WARN] Docker Compose not found. Some orchestration features may be unavailable.")
 
-def check_wsl_if_windows():
+def check_wsl_if_windows(probe=None):
     """If on Windows, check for WSL (if required)."""
-    if platform.system().lower() == "windows":
+    if IS_WINDOWS:
         try:
-            subprocess.check_call(["wsl", "--version"], stdout=subprocess.DEVNULL)
+            if probe is None:
+                subprocess.check_call(["wsl", "--version"], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+            elif probe[0] != 0:
+                raise RuntimeError(probe[1])
             print("[INFO] WSL is installed. Docker with WSL2 backend should work.")
         except Exception:
             print("[WARN] WSL not found. If you're on a legacy Windows client OS, Docker containers may require custom setup.")
 
 def check_all_dependencies():
-    """Run all prerequisite checks."""
+    """Run all prerequisite checks (only once per run)."""
+    global _CHECKED
+    if _CHECKED:
+        return
+    _CHECKED = True
     check_python_version(3, 7)
-    check_docker()
-    check_docker_compose()
-    check_wsl_if_windows()
+    # One batched probe; any tool it couldn't report on is checked on its own.
+    probes = probe_tools() or {}
+    check_docker(probes.get("docker"))
+    check_docker_compose(probes.get("compose"))
+    check_wsl_if_windows(probes.get("wsl"))
 
+@functools.lru_cache(maxsize=1)
 def detect_package_manager():
     """
     Detect the package manager on Linux.
     Returns one of: apt, apt-get, dnf, yum, zypper; or None.
+    (Cached: the answer can't change during a run.)
     """
-    for pm in ["apt", "apt-get", "dnf", "yum", "zypper"]:
-        if shutil.which(pm):
+    # One scandir pass over $PATH instead of a which-style lookup per candidate.
+    priority = ["apt", "apt-get", "dnf", "yum", "zypper"]
+    found = set()
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        try:
+            with os.scandir(directory or ".") as it:
+                for entry in it:
+                    if entry.name in priority and entry.name not in found and os.access(entry.path, os.X_OK):
+                        found.add(entry.name)
+        except OSError:
+            continue
+        if priority[0] in found:
+            break
+    for pm in priority:
+        if pm in found:
             return pm
     return None
 
 ###############################################################################
 # 2. OS Detection and Mapping to Docker Base Images
 ###############################################################################
+@functools.lru_cache(maxsize=1)
 def detect_os():
     """
     Detect the host OS and version.
     Returns (os_name, version) as lowercase strings.
+    (Cached, so dockerize/migrate don't re-read /etc/os-release.)
     """
-    if sys.platform.startswith("linux"):
+    if IS_LINUX:
+        # Python 3.10+ ships an os-release parser; use it when present.
+        if hasattr(platform, "freedesktop_os_release"):
+            try:
+                info = platform.freedesktop_os_release()
+                return info.get("NAME", "linux").lower(), info.get("VERSION_ID", "").lower()
+            except OSError:
+                pass
         try:
-            with open("/etc/os-release") as f:
-                lines = f.readlines()
             os_info = {}
-            for line in lines:
-                if "=" in line:
-                    key, value = line.strip().split("=", 1)
-                    os_info[key.lower()] = value.strip('"').lower()
+            with open("/etc/os-release") as f:
+                for line in f:
+                    # shlex handles the file's shell quoting/escapes and comments.
+                    try:
+                        parts = shlex.split(line, comments=True)
+                    except ValueError:
+                        continue  # e.g. an unbalanced quote: skip just this line
+                    if len(parts) == 1 and "=" in parts[0]:
+                        key, value = parts[0].split("=", 1)
+                        os_info[key.lower()] = value.lower()
             os_name = os_info.get("name", "linux")
             version_id = os_info.get("version_id", "")
             return os_name, version_id
         except Exception as e:
             print(f"[WARN] Could not read /etc/os-release: {e}")
             return "linux", ""
-    elif sys.platform == "win32":
+    elif IS_WINDOWS:
         # Windows detection
-        os_name = platform.system().lower()  # "windows"
+        os_name = "windows"
         version = platform.release().lower()  # e.g., "xp", "7", "vista", "2008 server", "2012 server", etc.
         return os_name, version
     else:
         print("[ERROR] Only Linux and Windows systems are supported.")
         sys.exit(1)
 
+# Linux mappings (using examples from your list)
+LINUX_IMAGE_MAP = {
+    "centos": {
+        "6":  "centos:6",    # Note: May require a custom image if not available
+        "7":  "centos:7",
+        "8":  "centos:8",
+        "9":  "centos:stream9",
+        "":   "ubuntu:latest"  # fallback
+    },
+    "ubuntu": {
+        "14": "ubuntu:14.04",
+        "16": "ubuntu:16.04",
+        "18": "ubuntu:18.04",
+        "20": "ubuntu:20.04",
+        "22": "ubuntu:22.04",
+    },
+    "debian": {
+        "7":  "debian:7",
+        "8":  "debian:8",
+        "9":  "debian:9",
+        "10": "debian:10",
+        "11": "debian:11",
+        "12": "debian:12",
+    },
+    "fedora": {
+        "25": "fedora:25",
+        "26": "fedora:26",
+        "27": "fedora:27",
+        "28": "fedora:28",
+        "29": "fedora:29",
+        "30": "fedora:30",
+        "31": "fedora:31",
+        "35": "fedora:35",
+    },
+    "opensuse leap": {
+        "15": "opensuse/leap:15",
+    },
+    "opensuse tumbleweed": {
+        "":   "opensuse/tumbleweed"
+    },
+    # Fallback for generic Linux
+    "linux": {
+        "":   "ubuntu:latest"
+    },
+}
+
+# Flattened view of LINUX_IMAGE_MAP: (distro, major version) -> image, plus the
+# per-distro fallback, so a lookup is a couple of dict hits instead of a scan.
+IMAGE_BY_KEY = {
+    (distro, ver): img
+    for distro, ver_map in LINUX_IMAGE_MAP.items()
+    for ver, img in ver_map.items() if ver
+}
+FALLBACK_BY_DISTRO = {
+    distro: ver_map.get("", "ubuntu:latest")
+    for distro, ver_map in LINUX_IMAGE_MAP.items()
+}
+DISTRO_TOKENS = frozenset(LINUX_IMAGE_MAP)
+
+def _distro_token(os_name):
+    """Return the LINUX_IMAGE_MAP key named in os_name, or None."""
+    words = os_name.split()
+    for i, word in enumerate(words):
+        # Two-word keys first ("opensuse leap"), then the single word.
+        pair = " ".join(words[i:i + 2])
+        if pair in DISTRO_TOKENS:
+            return pair
+        if word in DISTRO_TOKENS:
+            return word
+    # Names that don't tokenize cleanly fall back to a substring match.
+    for distro in LINUX_IMAGE_MAP:
+        if distro in os_name:
+            return distro
+    return None
+
+# Windows mappings – note these are placeholders for legacy OSes:
+WINDOWS_IMAGE_MAP = {
+    "xp":      "legacy-windows/xp:latest",       # Custom image required
+    "vista":   "legacy-windows/vista:latest",    # Custom image required
+    "7":       "legacy-windows/win7:latest",       # Custom image required
+    "2008":    "legacy-windows/win2008:latest",    # Custom image required
+    "2012":    "legacy-windows/win2012:latest",    # Custom image required
+    "10":      "mcr.microsoft.com/windows/nanoserver:1809",
+    "2016":    "mcr.microsoft.com/windows/servercore:2016",
+    "2019":    "mcr.microsoft.com/windows/servercore:ltsc2019",
+    "2022":    "mcr.microsoft.com/windows/servercore:ltsc2022"
+}
+
+@functools.lru_cache(maxsize=32)
 def map_os_to_docker_image(os_name, version):
     """
     Map the detected OS to a recommended Docker base image.
@@ -145,136 +337,252 @@ def map_os_to_docker_image(os_name, version):
     For Windows, legacy OSes (XP, Vista, 7, Server 2008, 2012) use placeholder images,
     while newer ones use official Microsoft images.
     """
-    # Linux mappings (using examples from your list)
-    linux_map = {
-        "centos": {
-            "6":  "centos:6",    # Note: May require a custom image if not available
-            "7":  "centos:7",
-            "8":  "centos:8",
-            "9":  "centos:stream9",
-            "":   "ubuntu:latest"  # fallback
-        },
-        "ubuntu": {
-            "14": "ubuntu:14.04",
-            "16": "ubuntu:16.04",
-            "18": "ubuntu:18.04",
-            "20": "ubuntu:20.04",
-            "22": "ubuntu:22.04",
-        },
-        "debian": {
-            "7":  "debian:7",
-            "8":  "debian:8",
-            "9":  "debian:9",
-            "10": "debian:10",
-            "11": "debian:11",
-            "12": "debian:12",
-        },
-        "fedora": {
-            "25": "fedora:25",
-            "26": "fedora:26",
-            "27": "fedora:27",
-            "28": "fedora:28",
-            "29": "fedora:29",
-            "30": "fedora:30",
-            "31": "fedora:31",
-            "35": "fedora:35",
-        },
-        "opensuse leap": {
-            "15": "opensuse/leap:15",
-        },
-        "opensuse tumbleweed": {
-            "":   "opensuse/tumbleweed"
-        },
-        # Fallback for generic Linux
-        "linux": {
-            "":   "ubuntu:latest"
-        },
-    }
-
-    # Windows mappings – note these are placeholders for legacy OSes:
-    windows_map = {
-        "xp":      "legacy-windows/xp:latest",       # Custom image required
-        "vista":   "legacy-windows/vista:latest",    # Custom image required
-        "7":       "legacy-windows/win7:latest",       # Custom image required
-        "2008":    "legacy-windows/win2008:latest",    # Custom image required
-        "2012":    "legacy-windows/win2012:latest",    # Custom image required
-        "10":      "mcr.microsoft.com/windows/nanoserver:1809",
-        "2016":    "mcr.microsoft.com/windows/servercore:2016",
-        "2019":    "mcr.microsoft.com/windows/servercore:ltsc2019",
-        "2022":    "mcr.microsoft.com/windows/servercore:ltsc2022"
-    }
-
     if os_name == "windows":
-        for key, img in windows_map.items():
+        for key, img in WINDOWS_IMAGE_MAP.items():
             if key in version:
                 return img
         # Fallback for Windows if no match is found
         return "mcr.microsoft.com/windows/servercore:ltsc2019"
     else:
-        # For Linux, attempt to match the distro keyword in os_name
-        for distro, ver_map in linux_map.items():
-            if distro in os_name:
-                short_ver = version.split(".")[0] if version else ""
-                if short_ver in ver_map:
-                    return ver_map[short_ver]
-                if "" in ver_map:
-                    return ver_map[""]
-                return "ubuntu:latest"
-        # If no distro matches, return a generic Linux image
-        return "ubuntu:latest"
+        # For Linux, find the distro keyword in os_name and look it up directly
+        tok = _distro_token(os_name)
+        short_ver = version.split(".")[0] if version else ""
+        # If no distro/version matches, return the distro fallback or a generic Linux image
+        return IMAGE_BY_KEY.get((tok, short_ver)) or FALLBACK_BY_DISTRO.get(tok, "ubuntu:latest")
 
 ###############################################################################
 # 3. Core Dockerization & Migration Functions
 ###############################################################################
+DOCKER_SOCKET = "/var/run/docker.sock"
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to the Docker daemon's unix socket."""
+    def __init__(self, path, timeout=None):
+        super().__init__("docker", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._socket_path)
+
+def docker_api(method, path, body=None):
+    """
+    Call the Docker Engine API directly over the local socket, skipping the
+    `docker` CLI process. Returns the open HTTPResponse, or None when the
+    socket isn't usable here (Windows, remote DOCKER_HOST, no permission)
+    so callers can fall back to the CLI.
+    """
+    docker_host = os.environ.get("DOCKER_HOST")
+    if docker_host and docker_host != f"unix://{DOCKER_SOCKET}":
+        return None
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(DOCKER_SOCKET):
+        return None
+    conn = _UnixHTTPConnection(DOCKER_SOCKET)
+    try:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        return conn.getresponse()
+    except OSError:
+        conn.close()
+        return None
+
+def _split_image_ref(image):
+    """Split 'repo[:tag|@digest]' into (repo, tag-or-digest), defaulting to 'latest'."""
+    if "@" in image:
+        return image.split("@", 1)
+    repo, sep, tag = image.rpartition(":")
+    if sep and "/" not in tag:
+        return repo, tag
+    return image, "latest"
+
+def iter_pull_progress(image):
+    """
+    Pull an image and yield (layer_id, status, progress_bytes) as the pull
+    proceeds, so callers can render progress without waiting for the end.
+    progress_bytes is None when unknown. Raises CalledProcessError on failure.
+    """
+    repo, tag = _split_image_ref(image)
+    query = urllib.parse.urlencode({"fromImage": repo, "tag": tag})
+    resp = docker_api("POST", f"/images/create?{query}")
+    if resp is not None:
+        ok = resp.status == 200
+        # The body is a stream of JSON progress objects, one per line.
+        for line in resp:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if "error" in event:
+                ok = False
+                print(f"[WARN] {event['error']}")
+            else:
+                detail = event.get("progressDetail") or {}
+                yield event.get("id", ""), event.get("status", ""), detail.get("current")
+        resp.close()
+        if ok:
+            return
+    # CLI path (also the retry path, since the CLI has stored registry credentials).
+    proc = subprocess.Popen(["docker", "pull", image], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, universal_newlines=True, bufsize=1)
+    for line in proc.stdout:
+        line = line.rstrip("\n")
+        layer_id, sep, status = line.partition(": ")
+        if not sep or " " in layer_id:
+            layer_id, status = "", line
+        yield layer_id, status, None
+    if proc.wait():
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+# Images already pulled or found locally during this run.
+_PULLED = set()
+
+def image_exists_locally(image):
+    """Return True if the image is already in the local Docker image store."""
+    resp = docker_api("GET", f"/images/{urllib.parse.quote(image, safe='/:@')}/json")
+    if resp is not None:
+        resp.read()
+        resp.close()
+        return resp.status == 200
+    return subprocess.call(["docker", "image", "inspect", image], stdin=subprocess.DEVNULL,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) == 0
+
 def pull_docker_image(image):
     """Pull the given Docker image."""
     try:
         print(f"[INFO] Pulling Docker image: {image}")
-        subprocess.check_call(["docker", "pull", image])
+        for layer_id, status, progress_bytes in iter_pull_progress(image):
+            if progress_bytes is None:
+                print(f"{layer_id}: {status}" if layer_id else status)
         print(f"[INFO] Successfully pulled image: {image}")
+        _PULLED.add(image)
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not pull image '{image}': {e}")
 
+def pull_docker_images(images):
+    """
+    Pull several Docker images at once. Each pull is an independent,
+    network-bound child process, so they run side by side in threads.
+    Images already present locally are not pulled again.
+    """
+    images = [img for img in dict.fromkeys(images) if img not in _PULLED]
+    for image in list(images):
+        if image_exists_locally(image):
+            print(f"[INFO] Image '{image}' is already present locally; skipping pull.")
+            _PULLED.add(image)
+            images.remove(image)
+    if len(images) <= 1:
+        for image in images:
+            pull_docker_image(image)
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(4, len(images))) as ex:
+        list(ex.map(pull_docker_image, images))
+
 def run_generic_container(os_name, base_image, container_name="generic_container"):
     """
     Launch a generic container from the base image with an interactive shell.
     For Windows, use 'cmd.exe'; for Linux, use '/bin/bash'.
     """
-    command = "cmd.exe" if os_name == "windows" else "/bin/bash"
+    command = "cmd.exe" if IS_WINDOWS else "/bin/bash"
     try:
         print(f"[INFO] Launching generic container '{container_name}' using image '{base_image}' with shell '{command}'")
         subprocess.check_call(["docker", "run", "-it", "--name", container_name, base_image, command])
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not launch generic container: {e}")
 
+# A sample mapping – you can expand this as needed. Read-only, and shared by
+# both the plain and the with-config service launchers.
+SERVICE_IMAGES = types.MappingProxyType({
+    "dns":   "internetsystemsconsortium/bind9:9.16",
+    "ftp":   "fauria/vsftpd",
+    "pop3":  "instrumentisto/dovecot",
+    "smtp":  "namshi/smtp",
+    "ntp":   "cturra/ntp",
+    "http":  "httpd:2.4",
+    "https": "httpd:2.4",
+    "php5":  "php:5.6-apache",
+    "db":    "mysql:5.7",
+    "postgres": "postgres:9.6",
+    "iis":   "mcr.microsoft.com/windows/servercore/iis:windowsservercore-ltsc2019"
+})
+
+# Pinned sha256 digests for the service images, keyed by tag (written by
+# `--action refresh-digests`). Running image@digest avoids re-resolving tags.
+SERVICE_DIGESTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "service_digests.json")
+
+@functools.lru_cache(maxsize=1)
+def load_service_digests():
+    """Return the {image tag: digest} pins, or {} if none have been recorded."""
+    try:
+        with open(SERVICE_DIGESTS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def pinned_image(image):
+    """Return 'repo@sha256:...' for an image with a recorded digest, else the tag itself."""
+    digest = load_service_digests().get(image)
+    if not digest:
+        return image
+    return f"{_split_image_ref(image)[0]}@{digest}"
+
+def image_repo_digest(image):
+    """Return the registry digest (sha256:...) of a locally present image, or None."""
+    resp = docker_api("GET", f"/images/{urllib.parse.quote(image, safe='/:@')}/json")
+    if resp is not None:
+        data = resp.read()
+        resp.close()
+        repo_digests = (json.loads(data).get("RepoDigests") or []) if resp.status == 200 else []
+    else:
+        try:
+            out = subprocess.check_output(["docker", "image", "inspect", "--format", "{{json .RepoDigests}}", image],
+                                          stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            repo_digests = json.loads(out) or []
+        except (subprocess.CalledProcessError, ValueError):
+            repo_digests = []
+    repo = _split_image_ref(image)[0]
+    for ref in repo_digests:
+        name, _, digest = ref.partition("@")
+        if name == repo or name.endswith("/" + repo):
+            return digest
+    return None
+
+def refresh_service_digests():
+    """Pull every service image by tag and record its current digest in SERVICE_DIGESTS_FILE."""
+    images = sorted(set(SERVICE_IMAGES.values()))
+    digests = {}
+    for image in images:
+        pull_docker_image(image)
+        digest = image_repo_digest(image)
+        if digest:
+            digests[image] = digest
+        else:
+            print(f"[WARN] No registry digest found for '{image}'; it will run by tag.")
+    try:
+        with open(SERVICE_DIGESTS_FILE, "w") as f:
+            json.dump(digests, f, indent=2, sort_keys=True)
+            f.write("\n")
+    except OSError as e:
+        print(f"[ERROR] Could not write '{SERVICE_DIGESTS_FILE}': {e}")
+        return
+    load_service_digests.cache_clear()
+    print(f"[INFO] Recorded {len(digests)} digest(s) in '{SERVICE_DIGESTS_FILE}'.")
+
 def run_service_container(service, container_name=None):
     """
     Run a container for a specific service.
     (Note: Instead of hardcoding service images, you might later allow dynamic builds.)
     """
-    # A sample dictionary – you can expand this as needed.
-    service_images = {
-        "dns":   "internetsystemsconsortium/bind9:9.16",
-        "ftp":   "fauria/vsftpd",
-        "pop3":  "instrumentisto/dovecot",
-        "smtp":  "namshi/smtp",
-        "ntp":   "cturra/ntp",
-        "http":  "httpd:2.4",
-        "https": "httpd:2.4",
-        "php5":  "php:5.6-apache",
-        "db":    "mysql:5.7",
-        "postgres": "postgres:9.6",
-        "iis":   "mcr.microsoft.com/windows/servercore/iis:windowsservercore-ltsc2019"
-    }
-    image = service_images.get(service.lower())
+    image = SERVICE_IMAGES.get(service.lower())
     if not image:
         print(f"[WARN] No pre-built container mapping for service '{service}'.")
         return
     if not container_name:
         container_name = f"{service.lower()}_container"
+    image = pinned_image(image)
     try:
         print(f"[INFO] Running service container for '{service}' using image '{image}'")
-        subprocess.check_call(["docker", "run", "-d", "--name", container_name, image])
+        subprocess.check_call(["docker", "run", "--detach", "--name", container_name, image],
+                              stdin=subprocess.DEVNULL)
         print(f"[INFO] Service container '{container_name}' started.")
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not run container for service '{service}': {e}")
@@ -283,12 +591,7 @@ def run_service_with_config(service, host_config, container_config, container_na
     """
     Run a service container with a host configuration file mounted.
     """
-    service_images = {
-        "dns": "internetsystemsconsortium/bind9:9.16",
-        "ftp": "fauria/vsftpd",
-        # Expand as needed...
-    }
-    image = service_images.get(service.lower())
+    image = SERVICE_IMAGES.get(service.lower())
     if not image:
         print(f"[WARN] No pre-built container mapping for service '{service}'.")
         return
@@ -297,54 +600,73 @@ def run_service_with_config(service, host_config, container_config, container_na
         return
     if not container_name:
         container_name = f"{service.lower()}_container"
+    image = pinned_image(image)
     try:
         print(f"[INFO] Running '{service}' container with configuration from '{host_config}'")
         subprocess.check_call([
-            "docker", "run", "-d", "--name", container_name,
+            "docker", "run", "--detach", "--name", container_name,
             "-v", f"{os.path.abspath(host_config)}:{container_config}",
             image
-        ])
+        ], stdin=subprocess.DEVNULL)
         print(f"[INFO] Service container '{container_name}' started with config mounted at '{container_config}'.")
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not run container for service '{service}' with config: {e}")
 
+def launch(mode, os_ctx=None, service=None, host_config=None, container_config="/etc/service.conf",
+           source_dir=None, target_dir=None, container_name=None, command=None):
+    """
+    Shared OS -> image -> pull -> run pipeline behind the dockerize and migrate actions.
+    mode is "dockerize" or "migrate"; os_ctx is an already detected (os_name, version)
+    so callers that have it don't trigger detection again.
+    """
+    os_name, version = detect_os() if os_ctx is None else os_ctx
+    base_image = map_os_to_docker_image(os_name, version)
+    images = [base_image]
+    if mode == "dockerize":
+        print(f"[INFO] Detected OS: {os_name} (Version: {version})")
+        if service:
+            # Fetch the service image alongside the base image rather than after it.
+            service_image = SERVICE_IMAGES.get(service.lower())
+            if service_image:
+                images.append(pinned_image(service_image))
+    pull_docker_images(images)
+
+    if mode == "migrate":
+        container_name = container_name or "migrate_container"
+        # Build the docker run command with volume mapping.
+        run_cmd = ["docker", "run", "-d", "--name", container_name, "-v", f"{os.path.abspath(source_dir)}:{target_dir}", base_image]
+        if command:
+            run_cmd.append(command)
+        try:
+            print(f"[INFO] Running migration container '{container_name}' with source '{source_dir}' mounted to '{target_dir}'")
+            subprocess.check_call(run_cmd, stdin=subprocess.DEVNULL)
+            print(f"[INFO] Migration container '{container_name}' launched.")
+        except subprocess.CalledProcessError as e:
+            print(f"[ERROR] Could not run migration container: {e}")
+    elif service:
+        if host_config:
+            run_service_with_config(service, host_config, container_config, container_name)
+        else:
+            run_service_container(service, container_name)
+    else:
+        # No service specified; launch an interactive container for manual configuration.
+        run_generic_container(os_name, base_image, container_name or "generic_container")
+
 def run_migration_container(source_dir, target_dir, container_name="migrate_container", command=None):
     """
     Launch a container from the matched base OS image with a volume mount
     to migrate host files (e.g., configuration files) into the container.
     Optionally run a command inside the container.
     """
-    os_name, version = detect_os()
-    base_image = map_os_to_docker_image(os_name, version)
-    pull_docker_image(base_image)
-    # Build the docker run command with volume mapping.
-    run_cmd = ["docker", "run", "-d", "--name", container_name, "-v", f"{os.path.abspath(source_dir)}:{target_dir}", base_image]
-    if command:
-        run_cmd.append(command)
-    try:
-        print(f"[INFO] Running migration container '{container_name}' with source '{source_dir}' mounted to '{target_dir}'")
-        subprocess.check_call(run_cmd)
-        print(f"[INFO] Migration container '{container_name}' launched.")
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Could not run migration container: {e}")
+    launch("migrate", source_dir=source_dir, target_dir=target_dir,
+           container_name=container_name, command=command)
 
 def dockerize(service=None, host_config=None, container_config="/etc/service.conf"):
     """
     If a service is specified, run that service container (with optional config).
     Otherwise, launch a generic container from the base OS image for manual service building.
     """
-    os_name, version = detect_os()
-    print(f"[INFO] Detected OS: {os_name} (Version: {version})")
-    base_image = map_os_to_docker_image(os_name, version)
-    pull_docker_image(base_image)
-    if service:
-        if host_config:
-            run_service_with_config(service, host_config, container_config)
-        else:
-            run_service_container(service)
-    else:
-        # No service specified; launch an interactive container for manual configuration.
-        run_generic_container(os_name, base_image)
+    launch("dockerize", service=service, host_config=host_config, container_config=container_config)
 
 ###############################################################################
 # 4. Snapshot, Integrity Check, and Security Functions
@@ -355,7 +677,17 @@ def snapshot_container(container_name, backup_tag):
     """
     try:
         print(f"[INFO] Creating snapshot for container '{container_name}'")
-        subprocess.check_call(["docker", "commit", container_name, backup_tag])
+        repo, tag = _split_image_ref(backup_tag)
+        query = urllib.parse.urlencode({"container": container_name, "repo": repo, "tag": tag})
+        resp = docker_api("POST", f"/commit?{query}")
+        if resp is None:
+            subprocess.check_call(["docker", "commit", container_name, backup_tag], stdin=subprocess.DEVNULL)
+        else:
+            data = resp.read()
+            resp.close()
+            if resp.status != 201:
+                print(f"[ERROR] Could not snapshot container '{container_name}': {data.decode('utf-8', 'replace').strip()}")
+                return
         print(f"[INFO] Snapshot created with tag '{backup_tag}'")
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not snapshot container '{container_name}': {e}")
@@ -366,7 +698,17 @@ def integrity_check(container_name):
     """
     try:
         print(f"[INFO] Performing integrity check on container '{container_name}'")
-        diff_output = subprocess.check_output(["docker", "diff", container_name]).decode("utf-8")
+        resp = docker_api("GET", f"/containers/{urllib.parse.quote(container_name)}/changes")
+        if resp is None:
+            diff_output = subprocess.check_output(["docker", "diff", container_name], stdin=subprocess.DEVNULL).decode("utf-8")
+        else:
+            data = resp.read()
+            resp.close()
+            if resp.status != 200:
+                print(f"[ERROR] Could not perform integrity check on container '{container_name}': {data.decode('utf-8', 'replace').strip()}")
+                return
+            # Same "C /path" lines `docker diff` prints (Kind 0/1/2 = C/A/D).
+            diff_output = "\n".join(f"{'CAD'[c['Kind']]} {c['Path']}" for c in json.loads(data) or [])
         if diff_output:
             print("[WARN] Integrity differences detected:")
             print(diff_output)
@@ -380,7 +722,8 @@ def advanced_security_check():
     Check Docker version for vulnerabilities and output security recommendations.
     """
     try:
-        version_output = subprocess.check_output(["docker", "--version"]).decode("utf-8").strip()
+        # Reuse the version captured by check_docker() when available.
+        version_output = _DOCKER_VERSION or subprocess.check_output(["docker", "--version"], stdin=subprocess.DEVNULL).decode("utf-8").strip()
         print(f"[INFO] Docker version: {version_output}")
         known_bad_versions = ["18.09", "19.03"]
         if any(bad in version_output for bad in known_bad_versions):
@@ -413,8 +756,9 @@ def main():
         description="CCDC-Style Hardening & Containerization Tool (Expanded for Legacy Linux and Windows)"
     )
     parser.add_argument("--action", required=True,
-                        choices=["check", "dockerize", "migrate", "backup", "integrity", "security", "recommendations"],
-                        help="Action to perform: check, dockerize, migrate, backup, integrity, security, recommendations")
+                        choices=["check", "dockerize", "migrate", "backup", "integrity", "security", "recommendations",
+                                 "refresh-digests"],
+                        help="Action to perform: check, dockerize, migrate, backup, integrity, security, recommendations, refresh-digests")
     parser.add_argument("--service", help="Name of the service to run (e.g., dns, ftp, pop3, etc.)")
     parser.add_argument("--config", help="Path to host configuration file to mount into the container")
     parser.add_argument("--container-config", default="/etc/service.conf",
@@ -428,6 +772,8 @@ def main():
     parser.add_argument("--container-name", help="Name for the migration container", default="migrate_container")
     
     args = parser.parse_args()
+    # Detected once here and handed down, so no path re-derives it.
+    os_ctx = detect_os() if args.action in ("dockerize", "migrate") else None
 
     if args.action == "check":
         check_all_dependencies()
@@ -440,13 +786,15 @@ def main():
         check_all_dependencies()
         # If a service is specified, attempt to run that service.
         # Otherwise, run a generic container with an interactive shell.
-        dockerize(service=args.service, host_config=args.config, container_config=args.container_config)
+        launch("dockerize", os_ctx, service=args.service, host_config=args.config,
+               container_config=args.container_config)
     elif args.action == "migrate":
         check_all_dependencies()
         if not args.source or not args.target:
             print("[ERROR] For migration, please specify both --source and --target directories.")
             sys.exit(1)
-        run_migration_container(args.source, args.target, container_name=args.container_name, command=args.cmd)
+        launch("migrate", os_ctx, source_dir=args.source, target_dir=args.target,
+               container_name=args.container_name, command=args.cmd)
     elif args.action == "backup":
         check_all_dependencies()
         if not args.container or not args.backup_tag:
@@ -462,6 +810,9 @@ def main():
     elif args.action == "security":
         check_all_dependencies()
         advanced_security_check()
+    elif args.action == "refresh-digests":
+        check_all_dependencies()
+        refresh_service_digests()
     elif args.action == "recommendations":
         check_python_version(3, 7)
         show_recommendations()
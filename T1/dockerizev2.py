@@ -34,15 +34,39 @@ import sys
 import platform
 import subprocess
 import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import ctypes
+import functools
+import http.client
+import json
 import os
 import hashlib
-import time
 import shutil
+import signal
+import posixpath
+import queue
+import socket
+import struct
+import tarfile
+import threading
+import types
+import urllib.parse
+try:
+    import grp
+except ImportError:  # Windows
+    grp = None
+
+# The host platform doesn't change while we run; ask uname once.
+SYSNAME = platform.system().lower()
+RELEASE = platform.release().lower()
 
 # -------------------------------------------------
 # 1. Docker Auto-Installation & Group-Fix Logic
 # -------------------------------------------------
 
+@functools.lru_cache(maxsize=None)
 def detect_linux_package_manager():
     """Detect common Linux package managers."""
     for pm in ["apt", "apt-get", "dnf", "yum", "zypper"]:
@@ -64,13 +88,12 @@ def attempt_install_docker_linux():
             subprocess.check_call(["sudo", pm, "install", "-y", "docker.io"])
         elif pm in ("yum", "dnf"):
             subprocess.check_call(["sudo", pm, "-y", "install", "docker"])
-            subprocess.check_call(["sudo", "systemctl", "enable", "docker"])
-            subprocess.check_call(["sudo", "systemctl", "start", "docker"])
+            # One systemctl call enables and starts the service.
+            subprocess.check_call(["sudo", "systemctl", "enable", "--now", "docker"])
         elif pm == "zypper":
             subprocess.check_call(["sudo", "zypper", "refresh"])
             subprocess.check_call(["sudo", "zypper", "--non-interactive", "install", "docker"])
-            subprocess.check_call(["sudo", "systemctl", "enable", "docker"])
-            subprocess.check_call(["sudo", "systemctl", "start", "docker"])
+            subprocess.check_call(["sudo", "systemctl", "enable", "--now", "docker"])
         else:
             print(f"[ERROR] Package manager '{pm}' is not fully supported for auto-installation.")
             return False
@@ -109,10 +132,99 @@ def attempt_install_docker_nix():
         print(f"[ERROR] Auto-installation of Docker on Nix failed: {e}")
         return False
 
+# -------------------------------------------------
+# Docker Engine API over the local socket
+# -------------------------------------------------
+# Talking HTTP to the daemon directly skips a docker CLI fork+exec per call.
+# Everything below returns None when the socket isn't usable (Windows, a remote
+# DOCKER_HOST, no permission), and callers then fall back to the CLI.
+
+DOCKER_SOCKET = "/var/run/docker.sock"
+
+# argv prefixes for the CLI fallbacks, built once rather than on every call.
+_DOCKER_PS = ("docker", "ps")
+_DOCKER_EXPORT = ("docker", "export")
+_DOCKER_DIFF = ("docker", "diff")
+_DOCKER_CP = ("docker", "cp")
+_DOCKER_RM_F = ("docker", "rm", "-f")
+_DOCKER_RUN_RO = ("docker", "run", "-d", "--read-only", "--user")
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to the Docker daemon's unix socket."""
+    def __init__(self, path):
+        super().__init__("docker")
+        self._socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._socket_path)
+
+# One keep-alive connection per thread (the integrity loop calls from a thread pool).
+_API_LOCAL = threading.local()
+
+def _api_usable():
+    """True if the local Docker socket is the daemon we should be talking to."""
+    docker_host = os.environ.get("DOCKER_HOST")
+    if docker_host and docker_host != f"unix://{DOCKER_SOCKET}":
+        return False
+    return hasattr(socket, "AF_UNIX") and os.path.exists(DOCKER_SOCKET)
+
+def docker_api(method, path, body=None):
+    """Make a short API call on this thread's persistent connection; returns (status, body) or None."""
+    if not _api_usable():
+        return None
+    payload = json.dumps(body) if body is not None else None
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    reused = getattr(_API_LOCAL, "conn", None) is not None
+    for _ in range(2 if reused else 1):
+        conn = getattr(_API_LOCAL, "conn", None) or _UnixHTTPConnection(DOCKER_SOCKET)
+        _API_LOCAL.conn = conn
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        except (http.client.HTTPException, OSError):
+            # The daemon may have dropped an idle keep-alive connection; retry once on a new one.
+            conn.close()
+            _API_LOCAL.conn = None
+    return None
+
+@contextlib.contextmanager
+def docker_api_stream(method, path):
+    """Yield the open HTTPResponse of a streaming API call (own connection), or None."""
+    if not _api_usable():
+        yield None
+        return
+    conn = _UnixHTTPConnection(DOCKER_SOCKET)
+    try:
+        conn.request(method, path, headers={"Connection": "close"})
+        resp = conn.getresponse()
+    except (http.client.HTTPException, OSError):
+        conn.close()
+        yield None
+        return
+    try:
+        yield resp
+    finally:
+        resp.close()
+        conn.close()
+
+def _split_image_ref(image):
+    """Split 'repo[:tag|@digest]' into (repo, tag-or-digest), defaulting to 'latest'."""
+    if "@" in image:
+        return image.split("@", 1)
+    repo, sep, tag = image.rpartition(":")
+    if sep and "/" not in tag:
+        return repo, tag
+    return image, "latest"
+
 def can_run_docker():
-    """Return True if we can run 'docker ps' without error, else False."""
+    """Return True if we can reach the Docker daemon (API ping, else 'docker ps'), else False."""
+    result = docker_api("GET", "/_ping")
+    if result is not None:
+        return result[0] == 200
     try:
-        subprocess.check_call(["docker", "ps"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.check_call(_DOCKER_PS, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         return True
     except:
         return False
@@ -133,13 +245,26 @@ def fix_docker_group():
         print(f"[WARN] Could not add user to docker group: {e}")
 
     # On Linux, attempt to enable/start Docker
-    if platform.system().lower().startswith("linux"):
+    if SYSNAME.startswith("linux"):
         try:
-            subprocess.check_call(["sudo", "systemctl", "enable", "docker"])
-            subprocess.check_call(["sudo", "systemctl", "start", "docker"])
+            subprocess.check_call(["sudo", "systemctl", "enable", "--now", "docker"])
         except subprocess.CalledProcessError as e:
             print(f"[WARN] Could not enable/start docker service: {e}")
 
+    # The re-exec below only helps if this process lacks the group. If the daemon
+    # already answers (just started, or the group is already active), skip it.
+    if can_run_docker():
+        print("[INFO] Docker is reachable; no re-exec needed.")
+        return
+    try:
+        docker_gid = grp.getgrnam("docker").gr_gid if grp else None
+    except KeyError:
+        docker_gid = None
+    if docker_gid is not None and docker_gid in os.getgroups():
+        # Re-exec'ing can't grant a group we already have: the daemon itself is the problem.
+        print("[ERROR] Already in the 'docker' group, but Docker is still not accessible. Exiting.")
+        sys.exit(1)
+
     # Re-exec with 'sg docker' to avoid dropping user into an interactive shell
     print("[INFO] Re-executing script under 'sg docker' to activate group membership.")
     os.environ["CCDC_DOCKER_GROUP_FIX"] = "1"  # Avoid infinite loops
@@ -172,8 +297,7 @@ def ensure_docker_installed():
         return
 
     # If not installed or not accessible, try installing
-    sysname = platform.system().lower()
-    if sysname.startswith("linux"):
+    if SYSNAME.startswith("linux"):
         installed = attempt_install_docker_linux()
         if not installed:
             print("[ERROR] Could not auto-install Docker on Linux. Please install it manually.")
@@ -183,7 +307,7 @@ def ensure_docker_installed():
             fix_docker_group()
         else:
             print("[INFO] Docker is installed and accessible on Linux now.")
-    elif "bsd" in sysname:
+    elif "bsd" in SYSNAME:
         installed = attempt_install_docker_bsd()
         if not installed:
             print("[ERROR] Could not auto-install Docker on BSD. Please install it manually.")
@@ -192,7 +316,7 @@ def ensure_docker_installed():
             fix_docker_group()
         else:
             print("[INFO] Docker is installed and accessible on BSD now.")
-    elif "nix" in sysname:
+    elif "nix" in SYSNAME:
         installed = attempt_install_docker_nix()
         if not installed:
             print("[ERROR] Could not auto-install Docker on Nix. Please install manually.")
@@ -201,11 +325,11 @@ def ensure_docker_installed():
             fix_docker_group()
         else:
             print("[INFO] Docker is installed and accessible on Nix now.")
-    elif sysname == "windows":
+    elif SYSNAME == "windows":
         print("[ERROR] Docker not found, and auto-install is not supported on Windows. Please install Docker or Docker Desktop manually.")
         sys.exit(1)
     else:
-        print(f"[ERROR] Unrecognized system '{sysname}'. Docker is missing. Please install it manually.")
+        print(f"[ERROR] Unrecognized system '{SYSNAME}'. Docker is missing. Please install it manually.")
         sys.exit(1)
 
 # -------------------------------------------------
@@ -230,28 +354,37 @@ def check_docker_compose():
 
 def check_wsl_if_windows():
     """On Windows, check for WSL if needed (for non-Docker Desktop)."""
-    if platform.system().lower() == "windows":
+    if SYSNAME == "windows":
         try:
             subprocess.check_call(["wsl", "--version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             print("[INFO] WSL is installed.")
         except Exception:
             print("[WARN] WSL not found. Running Docker containers as non-root on legacy Windows may require custom images.")
 
+_DEPS_OK = False
+
 def check_all_dependencies():
-    """Run all prerequisite checks."""
+    """Run all prerequisite checks (once per process)."""
+    global _DEPS_OK
+    if _DEPS_OK:
+        return
     check_python_version(3, 7)
     ensure_docker_installed()
     check_docker_compose()
     check_wsl_if_windows()
+    # Warm the cached OS lookup now, so later calls (e.g. on every restore
+    # inside the integrity loop) never touch /etc/os-release again.
+    detect_os()
+    _DEPS_OK = True
 
 # -------------------------------------------------
 # 3. OS Detection & Docker Image Mapping
 # -------------------------------------------------
 
+@functools.lru_cache(maxsize=None)
 def detect_os():
     """Detect the host OS and version. Best-effort for Linux, BSD, Nix, Windows."""
-    sysname = platform.system().lower()
-    if sysname.startswith("linux"):
+    if SYSNAME.startswith("linux"):
         try:
             with open("/etc/os-release") as f:
                 lines = f.readlines()
@@ -265,68 +398,102 @@ def detect_os():
             return os_name, version_id
         except:
             return "linux", ""
-    elif sysname.startswith("freebsd") or sysname.startswith("openbsd") or sysname.startswith("netbsd"):
+    elif SYSNAME.startswith("freebsd") or SYSNAME.startswith("openbsd") or SYSNAME.startswith("netbsd"):
         return "bsd", ""
-    elif "nix" in sysname:
+    elif "nix" in SYSNAME:
         return "nix", ""
-    elif sysname == "windows":
-        version = platform.release().lower()
+    elif SYSNAME == "windows":
+        version = RELEASE
         return "windows", version
     else:
-        return sysname, ""
+        return SYSNAME, ""
 
+_LINUX_MAP = types.MappingProxyType({
+    "centos": {"6": "centos:6", "7": "centos:7", "8": "centos:8", "9": "centos:stream9", "": "ubuntu:latest"},
+    "ubuntu": {"14": "ubuntu:14.04", "16": "ubuntu:16.04", "18": "ubuntu:18.04", "20": "ubuntu:20.04", "22": "ubuntu:22.04"},
+    "debian": {"7": "debian:7", "8": "debian:8", "9": "debian:9", "10": "debian:10", "11": "debian:11", "12": "debian:12"},
+    "fedora": {"25": "fedora:25", "26": "fedora:26", "27": "fedora:27", "28": "fedora:28", "29": "fedora:29", "30": "fedora:30", "31": "fedora:31", "35": "fedora:35"},
+    "opensuse leap": {"15": "opensuse/leap:15"},
+    "opensuse tumbleweed": {"": "opensuse/tumbleweed"},
+    "linux": {"": "ubuntu:latest"}
+})
+_WINDOWS_MAP = types.MappingProxyType({
+    "xp":      "legacy-windows/xp:latest",
+    "vista":   "legacy-windows/vista:latest",
+    "7":       "legacy-windows/win7:latest",
+    "2008":    "legacy-windows/win2008:latest",
+    "2012":    "legacy-windows/win2012:latest",
+    "10":      "mcr.microsoft.com/windows/nanoserver:1809",
+    "2016":    "mcr.microsoft.com/windows/servercore:2016",
+    "2019":    "mcr.microsoft.com/windows/servercore:ltsc2019",
+    "2022":    "mcr.microsoft.com/windows/servercore:ltsc2022"
+})
+# (distro, major version) -> image, built once; "" is the per-distro fallback.
+_FLAT = {(distro, ver): img for distro, ver_map in _LINUX_MAP.items() for ver, img in ver_map.items()}
+# Longest keys first, so a specific name wins over a generic one like "linux".
+_DISTRO_KEYS_BY_LEN_DESC = tuple(sorted(_LINUX_MAP, key=len, reverse=True))
+
+@functools.lru_cache(maxsize=None)
 def map_os_to_docker_image(os_name, version):
     """Map the detected OS to a recommended Docker base image (best-effort)."""
-    linux_map = {
-        "centos": {"6": "centos:6", "7": "centos:7", "8": "centos:8", "9": "centos:stream9", "": "ubuntu:latest"},
-        "ubuntu": {"14": "ubuntu:14.04", "16": "ubuntu:16.04", "18": "ubuntu:18.04", "20": "ubuntu:20.04", "22": "ubuntu:22.04"},
-        "debian": {"7": "debian:7", "8": "debian:8", "9": "debian:9", "10": "debian:10", "11": "debian:11", "12": "debian:12"},
-        "fedora": {"25": "fedora:25", "26": "fedora:26", "27": "fedora:27", "28": "fedora:28", "29": "fedora:29", "30": "fedora:30", "31": "fedora:31", "35": "fedora:35"},
-        "opensuse leap": {"15": "opensuse/leap:15"},
-        "opensuse tumbleweed": {"": "opensuse/tumbleweed"},
-        "linux": {"": "ubuntu:latest"}
-    }
-    windows_map = {
-        "xp":      "legacy-windows/xp:latest",
-        "vista":   "legacy-windows/vista:latest",
-        "7":       "legacy-windows/win7:latest",
-        "2008":    "legacy-windows/win2008:latest",
-        "2012":    "legacy-windows/win2012:latest",
-        "10":      "mcr.microsoft.com/windows/nanoserver:1809",
-        "2016":    "mcr.microsoft.com/windows/servercore:2016",
-        "2019":    "mcr.microsoft.com/windows/servercore:ltsc2019",
-        "2022":    "mcr.microsoft.com/windows/servercore:ltsc2022"
-    }
     if os_name == "bsd":
         return "alpine:latest"
     elif os_name == "nix":
         return "alpine:latest"
     elif os_name == "windows":
-        for k, img in windows_map.items():
+        for k, img in _WINDOWS_MAP.items():
             if k in version:
                 return img
         return "mcr.microsoft.com/windows/servercore:ltsc2019"
     else:
         # assume some Linux distro
-        for distro, ver_map in linux_map.items():
+        short_ver = version.split(".")[0] if version else ""
+        for distro in _DISTRO_KEYS_BY_LEN_DESC:
             if distro in os_name:
-                short_ver = version.split(".")[0] if version else ""
-                if short_ver in ver_map:
-                    return ver_map[short_ver]
-                if "" in ver_map:
-                    return ver_map[""]
-                return "ubuntu:latest"
+                return _FLAT.get((distro, short_ver)) or _FLAT.get((distro, "")) or "ubuntu:latest"
         return "ubuntu:latest"
 
 # -------------------------------------------------
 # 4. Container Launch & Integrity Checking
 # -------------------------------------------------
 
+def _print_pull_progress(resp):
+    """Print the status lines of an /images/create stream; returns False if it reported an error."""
+    ok = True
+    for line in resp:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if "error" in event:
+            ok = False
+            print(f"[WARN] {event['error']}")
+        elif "status" in event and "progress" not in event:
+            print(f"{event['id']}: {event['status']}" if "id" in event else event["status"])
+    return ok
+
+def image_exists_locally(image):
+    """True if `image` is already in the local image store."""
+    result = docker_api("GET", f"/images/{urllib.parse.quote(image, safe='')}/json")
+    if result is not None:
+        return result[0] == 200
+    return subprocess.run(["docker", "image", "inspect", image], stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode == 0
+
 def pull_docker_image(image):
-    """Pull the specified Docker image."""
+    """Pull the specified Docker image, unless it is already present locally."""
+    if image_exists_locally(image):
+        print(f"[INFO] Docker image '{image}' is already present; not pulling.")
+        return
     try:
         print(f"[INFO] Pulling Docker image: {image}")
-        subprocess.check_call(["docker", "pull", image])
+        repo, tag = _split_image_ref(image)
+        query = urllib.parse.urlencode({"fromImage": repo, "tag": tag})
+        with docker_api_stream("POST", f"/images/create?{query}") as resp:
+            pulled = resp is not None and resp.status == 200 and _print_pull_progress(resp)
+        if not pulled:
+            # The CLI also covers registries that need stored credentials.
+            subprocess.check_call(["docker", "pull", image])
         print(f"[INFO] Successfully pulled image: {image}")
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not pull image '{image}': {e}")
@@ -348,56 +515,659 @@ def run_generic_container(os_name, base_image, container_name="megatron"):
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not launch container '{container_name}': {e}")
 
-def compute_container_hash(container_name):
-    """Compute a SHA256 hash of the container's filesystem by exporting it."""
+# Read size for hashing 'docker export' output; 1 MiB keeps syscalls and loop turns low.
+HASH_BUFSIZE = 1 << 20
+
+class _HashWriter:
+    """File-like sink that feeds everything written to it into a hash object."""
+    def __init__(self, hasher):
+        self.hasher = hasher
+
+    def write(self, data):
+        self.hasher.update(data)
+        return len(data)
+
+class _Prefetcher:
+    """
+    Reads a binary stream on a background thread, up to `depth` chunks ahead of
+    the consumer, so pipe reads overlap with hashing (which releases the GIL).
+    """
+    def __init__(self, stream, chunk_size=HASH_BUFSIZE, depth=8):
+        self._queue = queue.Queue(depth)
+        self._buf = bytearray()
+        self._eof = False
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._fill, args=(stream, chunk_size), daemon=True)
+        self._thread.start()
+
+    def _fill(self, stream, chunk_size):
+        try:
+            while not self._closed:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                self._queue.put(chunk)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._queue.put(b"")
+
+    def _next_chunk(self):
+        chunk = self._queue.get()
+        if not chunk:
+            self._eof = True
+            if self._error is not None:
+                raise self._error
+        return chunk
+
+    def read(self, size=-1):
+        while (size < 0 or len(self._buf) < size) and not self._eof:
+            self._buf += self._next_chunk()
+        if size < 0:
+            size = len(self._buf)
+        data = bytes(self._buf[:size])
+        del self._buf[:size]
+        return data
+
+    def close(self):
+        # Unblock a producer stuck on a full queue; it stops after its current read.
+        self._closed = True
+        while not self._eof:
+            self._eof = not self._queue.get()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _sha256_of_stream(fileobj):
+    """Return a sha256 hash object fed with everything readable from a binary stream."""
+    if hasattr(hashlib, "file_digest"):
+        # Python 3.11+: the read/update loop runs in C.
+        return hashlib.file_digest(fileobj, "sha256")
+    hasher = hashlib.sha256()
+    shutil.copyfileobj(fileobj, _HashWriter(hasher), HASH_BUFSIZE)
+    return hasher
+
+def _leaf_digest(path, member, tar):
+    """Hash one filesystem entry: its path, type, ownership, mode and content (or link target)."""
+    if member.isfile():
+        content = _sha256_of_stream(tar.extractfile(member)).digest()
+    elif member.issym() or member.islnk():
+        content = member.linkname.encode("utf-8", "surrogateescape")
+    elif member.ischr() or member.isblk():
+        content = f"{member.devmajor}:{member.devminor}".encode()
+    else:
+        content = b""
+    header = f"{member.type.decode()}\0{path}\0{member.uid}:{member.gid}:{member.mode:o}\0"
+    return hashlib.sha256(header.encode("utf-8", "surrogateescape") + content).digest()
+
+def _merkle_root(leaves):
+    """Fold {path: leaf digest} into a Merkle root (leaves in path order, odd node carried up)."""
+    level = [leaves[path] for path in sorted(leaves)]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    sha256 = hashlib.sha256
+    while len(level) > 1:
+        # Pairwise fold of one level; zip over the two strided slices avoids index math.
+        paired = [sha256(left + right).digest() for left, right in zip(level[::2], level[1::2])]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+def _container_changes(container_name):
+    """Return {path: kind} from 'docker diff' (kind is A, C or D), or None on failure."""
+    result = docker_api("GET", f"/containers/{urllib.parse.quote(container_name)}/changes")
+    if result is not None:
+        status, data = result
+        if status != 200:
+            print(f"[ERROR] 'docker diff' failed for container '{container_name}': {data.decode('utf-8', 'replace').strip()}")
+            return None
+        # Kind 0/1/2 = C/A/D, as 'docker diff' prints them.
+        return {c["Path"]: "CAD"[c["Kind"]] for c in json.loads(data) or []}
+    result = subprocess.run([*_DOCKER_DIFF, container_name], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        print(f"[ERROR] 'docker diff' failed for container '{container_name}': {result.stderr.strip()}")
+        return None
+    changes = {}
+    for line in result.stdout.splitlines():
+        kind, _, path = line.partition(" ")
+        if path:
+            changes[path] = kind
+    return changes
+
+def _refresh_leaf(container_name, path, leaves, stats=None):
+    """
+    Re-hash a single path via 'docker cp' (first tar entry only); drop it if it's gone.
+    Over the API, the archive response's stat header (name, size, mode, mtime, link
+    target) is checked against `stats` first, and an unchanged path keeps its leaf
+    without its content being read.
+    """
+    query = urllib.parse.urlencode({"path": path})
+    with docker_api_stream("GET", f"/containers/{urllib.parse.quote(container_name)}/archive?{query}") as resp:
+        if resp is not None:
+            member = None
+            if resp.status == 200:
+                stat = resp.getheader("X-Docker-Container-Path-Stat")
+                if stats is not None and stat:
+                    if stats.get(path) == stat and path in leaves:
+                        return
+                    stats[path] = stat
+                try:
+                    with tarfile.open(fileobj=resp, mode="r|") as tar:
+                        member = tar.next()
+                        if member is not None:
+                            leaves[path] = _leaf_digest(path, member, tar)
+                except tarfile.TarError:
+                    member = None
+            if member is None:
+                _drop_subtree(path, leaves)
+                if stats is not None:
+                    stats.pop(path, None)
+            return
+    proc = subprocess.Popen([*_DOCKER_CP, f"{container_name}:{path}", "-"],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=HASH_BUFSIZE)
+    member = None
     try:
-        proc = subprocess.Popen(["docker", "export", container_name], stdout=subprocess.PIPE)
-        hasher = hashlib.sha256()
-        while True:
-            chunk = proc.stdout.read(4096)
-            if not chunk:
-                break
-            hasher.update(chunk)
+        with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+            member = tar.next()
+            if member is not None:
+                # A directory's children show up in 'docker diff' on their own,
+                # so only the entry itself is needed here.
+                leaves[path] = _leaf_digest(path, member, tar)
+    except tarfile.TarError:
+        member = None
+    finally:
         proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
         proc.wait()
-        hash_val = hasher.hexdigest()
-        print(f"[INFO] Computed hash for container '{container_name}': {hash_val}")
-        return hash_val
-    except Exception as e:
-        print(f"[ERROR] Could not compute hash for container '{container_name}': {e}")
+    if member is None:
+        _drop_subtree(path, leaves)
+
+def _drop_subtree(path, leaves):
+    """Remove a path and everything below it from the leaf map."""
+    prefix = path.rstrip("/") + "/"
+    for p in [p for p in leaves if p == path or p.startswith(prefix)]:
+        del leaves[p]
+
+def _hash_export_entries(container_name, stream):
+    """Return {path: leaf digest} for every entry of an export tar stream, or None."""
+    leaves = {}
+    try:
+        with _Prefetcher(stream) as ahead, tarfile.open(fileobj=ahead, mode="r|") as tar:
+            for member in tar:
+                path = posixpath.normpath("/" + member.name)
+                leaves[path] = _leaf_digest(path, member, tar)
+    except tarfile.TarError as e:
+        print(f"[ERROR] Could not read export of container '{container_name}': {e}")
         return None
+    return leaves
+
+def build_merkle_root(container_name, cache):
+    """
+    Return a Merkle root over the container's filesystem entries, reusing `cache`
+    (a dict owned by the caller, empty on first use) between calls.
+
+    The first call hashes every entry from 'docker export'. Later calls ask
+    'docker diff' what changed: if nothing changed, the cached root is returned
+    as-is; otherwise only the listed paths (and any that dropped off the list
+    since last time) are re-read, and the root is re-folded from cached leaves.
+    Listed paths whose size/mode/mtime haven't moved since they were last read are
+    not re-hashed; callers clear the cache now and then to re-verify contents.
+    """
+    changes = _container_changes(container_name)
+    if changes is None:
+        return None
+    if "leaves" not in cache:
+        with docker_api_stream("GET", f"/containers/{urllib.parse.quote(container_name)}/export") as resp:
+            if resp is not None:
+                if resp.status != 200:
+                    print(f"[ERROR] 'docker export' failed for container '{container_name}'.")
+                    return None
+                leaves = _hash_export_entries(container_name, resp)
+            else:
+                proc = subprocess.Popen([*_DOCKER_EXPORT, container_name], stdout=subprocess.PIPE,
+                                        bufsize=HASH_BUFSIZE)
+                try:
+                    leaves = _hash_export_entries(container_name, proc.stdout)
+                finally:
+                    proc.stdout.close()
+                    proc.wait()
+                if proc.returncode != 0:
+                    print(f"[ERROR] 'docker export' failed for container '{container_name}'.")
+                    return None
+        if leaves is None:
+            return None
+        cache["leaves"] = leaves
+    elif changes or cache["changes"]:
+        leaves = cache["leaves"]
+        # Parents before children, so a deleted directory doesn't wipe re-added entries.
+        for path in sorted(set(changes) | set(cache["changes"])):
+            if changes.get(path) == "D":
+                _drop_subtree(path, leaves)
+            else:
+                _refresh_leaf(container_name, path, leaves, cache.setdefault("stats", {}))
+    else:
+        print(f"[INFO] 'docker diff' reports no changes in container '{container_name}'; skipping hash.")
+        return cache["root"]
+    cache["changes"] = changes
+    cache["root"] = _merkle_root(cache["leaves"])
+    print(f"[INFO] Computed Merkle root for container '{container_name}': {cache['root']}")
+    return cache["root"]
+
+def changed_entries(baseline_leaves, leaves):
+    """Paths whose leaf hash differs between two leaf maps (added, removed or modified), sorted."""
+    return sorted(path for path in baseline_leaves.keys() | leaves.keys()
+                  if baseline_leaves.get(path) != leaves.get(path))
+
+def _report_changed_entries(container_name, baseline_leaves, leaves, limit=20):
+    changed = changed_entries(baseline_leaves, leaves)
+    for path in changed[:limit]:
+        kind = "added" if path not in baseline_leaves else "removed" if path not in leaves else "modified"
+        print(f"[WARN]   {kind}: {path}")
+    if len(changed) > limit:
+        print(f"[WARN]   ... and {len(changed) - limit} more changed entries in '{container_name}'.")
+
+def _snapshot_repo(snapshot_tar):
+    """Local repository name snapshot images for `snapshot_tar` are tagged under."""
+    stem = os.path.splitext(os.path.basename(snapshot_tar))[0].lower()
+    stem = "".join(c if c.isalnum() else "-" for c in stem).strip("-") or "snapshot"
+    return f"dockerize-snapshot/{stem}"
+
+def _snapshot_tag(snapshot_tar):
+    """Fixed local tag a snapshot tar is kept under once loaded, tied to the tar's size and mtime."""
+    try:
+        st = os.stat(snapshot_tar)
+        version = f"{st.st_size:x}-{st.st_mtime_ns:x}"
+    except OSError:
+        version = "latest"
+    return f"{_snapshot_repo(snapshot_tar)}:{version}"
+
+def create_snapshot(container_name, snapshot_tar):
+    """Commit `container_name` and save it to `snapshot_tar`, keeping the committed image tagged for restores."""
+    commit_tag = _snapshot_repo(snapshot_tar) + ":latest"
+    try:
+        print(f"[INFO] Snapshotting container '{container_name}' to '{snapshot_tar}'")
+        subprocess.check_call(["docker", "commit", container_name, commit_tag], stdout=subprocess.DEVNULL)
+        subprocess.check_call(["docker", "save", "-o", snapshot_tar, commit_tag])
+        # Re-tag now that the tar's mtime is known, so restores find it without a 'docker load'.
+        subprocess.check_call(["docker", "tag", commit_tag, _snapshot_tag(snapshot_tar)])
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"[ERROR] Could not snapshot container '{container_name}': {e}")
+        return False
 
 def restore_container_from_snapshot(snapshot_tar, container_name):
     """Restore a container from a snapshot tar file in detached mode."""
     try:
         print(f"[INFO] Restoring container '{container_name}' from snapshot '{snapshot_tar}'")
-        subprocess.check_call(["docker", "load", "-i", snapshot_tar])
-        image_name = os.path.splitext(os.path.basename(snapshot_tar))[0]
+        image_name = _snapshot_tag(snapshot_tar)
+        if image_exists_locally(image_name):
+            print(f"[INFO] Snapshot image '{image_name}' already loaded; skipping 'docker load'.")
+        else:
+            out = subprocess.run(["docker", "load", "-i", snapshot_tar], stdout=subprocess.PIPE,
+                                 universal_newlines=True, check=True).stdout
+            # "Loaded image: repo:tag" or "Loaded image ID: sha256:..."; keep the last one.
+            loaded = [line.split(":", 1)[1].strip() for line in out.splitlines() if line.startswith("Loaded image")]
+            if not loaded:
+                print(f"[ERROR] 'docker load' did not report an image for '{snapshot_tar}'.")
+                return
+            subprocess.check_call(["docker", "tag", loaded[-1], image_name])
         os_name, _ = detect_os()
         user = "nonroot" if os_name == "windows" else "nobody"
-        subprocess.check_call(["docker", "run", "-d", "--read-only", "--user", user, "--name", container_name, image_name])
+        subprocess.check_call([*_DOCKER_RUN_RO, user, "--name", container_name, image_name])
         print(f"[INFO] Container '{container_name}' restored and launched.")
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not restore container '{container_name}' from snapshot: {e}")
 
-def continuous_integrity_check(container_name, snapshot_tar, check_interval=30):
-    """Continuously monitor the integrity of a running container."""
+def snapshot_baseline(snapshot_tar, container_name, cache):
+    """
+    Return the Merkle root of a container freshly restored from `snapshot_tar`,
+    filling `cache` as build_merkle_root would.
+
+    A pristine container (empty 'docker diff') restored from the same tar always
+    has the same root, so it is recorded once in a '<snapshot>.merkle.json'
+    sidecar and reused on later restores instead of re-reading the whole export.
+    """
+    sidecar = snapshot_tar + ".merkle.json"
+    try:
+        st = os.stat(snapshot_tar)
+        key = [st.st_size, st.st_mtime_ns]
+    except OSError:
+        key = None
+    changes = _container_changes(container_name)
+    if changes is None or changes or key is None:
+        # Not pristine (or no tar to key on): measure it the long way.
+        return build_merkle_root(container_name, cache)
+    try:
+        with open(sidecar) as f:
+            saved = json.load(f)
+        if saved.get("key") == key:
+            cache["leaves"] = {path: bytes.fromhex(leaf) for path, leaf in saved["leaves"].items()}
+            cache["changes"] = {}
+            cache["root"] = saved["root"]
+            print(f"[INFO] Reusing recorded baseline for snapshot '{snapshot_tar}': {cache['root']}")
+            return cache["root"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    root = build_merkle_root(container_name, cache)
+    if root:
+        try:
+            with open(sidecar, "w") as f:
+                json.dump({"key": key, "root": root,
+                           "leaves": {path: leaf.hex() for path, leaf in cache["leaves"].items()}}, f)
+        except OSError as e:
+            print(f"[WARN] Could not record snapshot baseline '{sidecar}': {e}")
+    return root
+
+# inotify(7) bits from <sys/inotify.h>: MODIFY, ATTRIB, MOVED_FROM, MOVED_TO, CREATE, DELETE.
+_IN_WATCH_MASK = 0x002 | 0x004 | 0x040 | 0x080 | 0x100 | 0x200
+_IN_ISDIR = 0x40000000
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+class _UpperDirWatch:
+    """Recursive inotify watch on a container's overlay upper (writable) dir."""
+    def __init__(self, root):
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        # IN_NONBLOCK and IN_CLOEXEC share their values with the O_ flags.
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._dirs = {}
+        try:
+            self._add_tree(root, strict=True)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_tree(self, top, strict=False):
+        def onerror(e):
+            if strict:
+                raise e
+        for dirpath, _, _ in os.walk(top, onerror=onerror):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dirpath), _IN_WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if strict:
+                    raise OSError(err, os.strerror(err), dirpath)
+                continue
+            self._dirs[wd] = dirpath
+
+    def drain(self):
+        """Read pending events, watching any new directories; True if there were any."""
+        changed = False
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, name_len = _INOTIFY_EVENT.unpack_from(buf, offset)
+                offset += _INOTIFY_EVENT.size
+                name = buf[offset:offset + name_len].rstrip(b"\0")
+                offset += name_len
+                changed = True
+                if mask & _IN_ISDIR and mask & (0x080 | 0x100) and wd in self._dirs:
+                    self._add_tree(os.path.join(self._dirs[wd], os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+def watch_upper_dir(container_name):
+    """
+    Return an inotify watch on the container's writable layer, or None when that
+    isn't possible (not Linux, not overlay2, or no access to /var/lib/docker).
+    """
+    if not SYSNAME.startswith("linux"):
+        return None
+    result = docker_api("GET", f"/containers/{urllib.parse.quote(container_name, safe='')}/json")
+    if result is not None and result[0] == 200:
+        upper = ((json.loads(result[1]).get("GraphDriver") or {}).get("Data") or {}).get("UpperDir", "")
+    else:
+        upper = subprocess.run(["docker", "inspect", "--format", "{{.GraphDriver.Data.UpperDir}}", container_name],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               universal_newlines=True).stdout.strip()
+    if not upper or upper == "<no value>":
+        return None
+    try:
+        return _UpperDirWatch(upper)
+    except (OSError, AttributeError) as e:
+        print(f"[INFO] Not watching the writable layer of '{container_name}' ({e}); relying on the interval timer.")
+        return None
+
+# Actions our own checks and snapshots cause; they must not wake the loop again.
+_SELF_INFLICTED_ACTIONS = frozenset({"export", "archive-path", "commit"})
+
+async def _pump_events(container_name, events, woke):
+    """Set `woke` for each 'docker events' line about the container."""
+    async for line in events.stdout:
+        action = line.decode().strip()
+        if action in _SELF_INFLICTED_ACTIONS:
+            continue
+        if not woke.is_set():
+            print(f"[INFO] Docker event '{action}' on '{container_name}'; checking now.")
+        woke.set()
+
+def _arm_watch(loop, container_name, watch, woke):
+    """Hook `watch` into the event loop so writes set `woke`; returns the watch or None."""
+    if watch is None:
+        return None
+    def on_readable():
+        if watch.drain() and not woke.is_set():
+            print(f"[INFO] Write into the writable layer of '{container_name}'; checking now.")
+            woke.set()
+    try:
+        loop.add_reader(watch.fd, on_readable)
+    except NotImplementedError:
+        watch.close()
+        return None
+    print(f"[INFO] Watching the writable layer of '{container_name}' for changes.")
+    return watch
+
+def _disarm_watch(loop, watch):
+    if watch is not None:
+        loop.remove_reader(watch.fd)
+        watch.close()
+
+async def _wait_for_change(woke, deadline, stop, debounce=1.0):
+    """
+    Return once `woke` is set (after letting a burst of activity settle for
+    `debounce` seconds), `stop` is set, or the loop clock reaches `deadline`.
+    """
+    loop = asyncio.get_event_loop()
+    waiters = [loop.create_task(woke.wait()), loop.create_task(stop.wait())]
+    try:
+        await asyncio.wait(waiters, timeout=max(0, deadline - loop.time()),
+                           return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+    if stop.is_set() or not woke.is_set():
+        return
+    # Coalesce follow-up activity, but never hold the check back past the deadline.
+    while True:
+        woke.clear()
+        remaining = min(debounce, deadline - loop.time())
+        if remaining <= 0:
+            return
+        try:
+            await asyncio.wait_for(woke.wait(), remaining)
+        except asyncio.TimeoutError:
+            return
+
+async def integrity_check_one(container_name, snapshot_tar, check_interval=30, full_check_every=20, stop=None):
+    """
+    Monitor one container until cancelled. The blocking docker/hash work runs in the
+    default thread pool, so many of these can share one event loop.
+    A cycle runs as soon as 'docker events' or an inotify watch on the container's
+    writable layer reports activity, and at least every `check_interval` seconds
+    regardless, since without the watch (not root, not overlay2) writes by
+    processes already inside the container raise no docker events.
+    Cycles are normally guarded by 'docker diff'; every `full_check_every` cycles
+    the root is rebuilt from a full export as a check on the diff itself.
+    Setting `stop` ends the monitor between cycles, never halfway through a restore.
+    """
+    loop = asyncio.get_event_loop()
+    if stop is None:
+        stop = asyncio.Event()
+    run = functools.partial(loop.run_in_executor, None)
     print(f"[INFO] Starting continuous integrity check on container '{container_name}' (interval: {check_interval} seconds).")
-    baseline_hash = compute_container_hash(container_name)
+    # Leaf hashes are kept between cycles so quiet cycles cost one 'docker diff'.
+    cache = {}
+    baseline_hash = await run(build_merkle_root, container_name, cache)
     if not baseline_hash:
-        print("[ERROR] Failed to obtain baseline hash. Exiting integrity check.")
+        print(f"[ERROR] Failed to obtain baseline hash for '{container_name}'. Exiting integrity check.")
         return
+    # The cache's leaves are updated in place, so keep a copy to say what changed.
+    baseline_leaves = dict(cache["leaves"])
+    woke = asyncio.Event()
+    try:
+        events = await asyncio.create_subprocess_exec(
+            "docker", "events", "--filter", f"container={container_name}", "--format", "{{.Action}}",
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    except (OSError, NotImplementedError):
+        events = None
+    pump = loop.create_task(_pump_events(container_name, events, woke)) if events is not None else None
+    watch = _arm_watch(loop, container_name, await run(watch_upper_dir, container_name), woke)
+    cycle = 0
+    # Periodic checks run on a fixed grid of the monotonic loop clock, so the
+    # time spent hashing doesn't stretch the period.
+    deadline = loop.time() + check_interval
     try:
         while True:
-            time.sleep(check_interval)
-            current_hash = compute_container_hash(container_name)
+            await _wait_for_change(woke, deadline, stop)
+            if stop.is_set():
+                break
+            scheduled = loop.time() >= deadline
+            if scheduled:
+                deadline += check_interval
+            cycle += 1
+            if full_check_every and cycle % full_check_every == 0:
+                cache = {}
+            current_hash = await run(build_merkle_root, container_name, cache)
             if current_hash != baseline_hash:
-                print("[WARN] Integrity violation detected! Restoring container from snapshot.")
-                subprocess.check_call(["docker", "rm", "-f", container_name])
-                restore_container_from_snapshot(snapshot_tar, container_name)
-                baseline_hash = compute_container_hash(container_name)
+                print(f"[WARN] Integrity violation detected in '{container_name}'! Restoring container from snapshot.")
+                if "leaves" in cache:
+                    _report_changed_entries(container_name, baseline_leaves, cache["leaves"])
+                _disarm_watch(loop, watch)
+                watch = None
+                # Non-zero when the container is already gone (e.g. deleted by an attacker); restore anyway.
+                await run(functools.partial(subprocess.call, [*_DOCKER_RM_F, container_name],
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+                await run(restore_container_from_snapshot, snapshot_tar, container_name)
+                # A new container: start over, from the snapshot's recorded baseline if possible.
+                cache = {}
+                baseline_hash = await run(snapshot_baseline, snapshot_tar, container_name, cache)
+                baseline_leaves = dict(cache.get("leaves", {}))
+                watch = _arm_watch(loop, container_name, await run(watch_upper_dir, container_name), woke)
             else:
-                print("[INFO] Integrity check passed; no changes detected.")
+                print(f"[INFO] Integrity check passed for '{container_name}'; no changes detected.")
+            behind = loop.time() - deadline
+            if scheduled and behind > 0:
+                # Don't queue up missed checks; run the next one straight away.
+                print(f"[WARN] Integrity check for '{container_name}' is {behind:.1f}s behind its "
+                      f"{check_interval}s interval; hashing is too slow for this interval.")
+                deadline = loop.time()
+    finally:
+        _disarm_watch(loop, watch)
+        if pump is not None:
+            pump.cancel()
+        if events is not None and events.returncode is None:
+            events.kill()
+            await events.wait()
+
+def bulk_inspect(names):
+    """
+    Look up several containers in one Docker call.
+    Returns {name: status} (e.g. 'running', 'exited') for those that exist;
+    names may be container names or ID prefixes.
+    """
+    result = docker_api("GET", "/containers/json?all=1")
+    if result is not None and result[0] == 200:
+        entries = [(c["Id"], [n.lstrip("/") for n in c.get("Names") or []], c.get("State", ""))
+                   for c in json.loads(result[1])]
+    else:
+        # 'docker inspect' prints what it finds and exits non-zero for the rest.
+        out = subprocess.run(["docker", "inspect", "--format", "{{.Id}} {{.Name}} {{.State.Status}}"] + list(names),
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+        entries = []
+        for line in out.splitlines():
+            parts = line.split()
+            if len(parts) == 3:
+                entries.append((parts[0], [parts[1].lstrip("/")], parts[2]))
+    # Exact names win over ID prefixes, as with docker itself: a name that merely
+    # looks like the start of another container's ID must not resolve to it.
+    by_name = {cname: status for _, cnames, status in entries for cname in cnames}
+    found = {name: by_name[name] for name in names if name in by_name}
+    for name in names:
+        if name not in found:
+            for cid, _, status in entries:
+                if cid.startswith(name):
+                    found[name] = status
+                    break
+    return found
+
+async def run_all(names, snapshot_tars, check_interval=30, full_check_every=20):
+    """
+    Monitor several containers concurrently (one snapshot tar per container).
+    The first Ctrl-C lets checks and restores already under way finish before
+    returning; a second one interrupts immediately.
+    """
+    loop = asyncio.get_event_loop()
+    stop = asyncio.Event()
+
+    def on_interrupt():
+        print("\n[INFO] Stopping once the checks in progress finish (Ctrl-C again to abort).")
+        stop.set()
+        loop.remove_signal_handler(signal.SIGINT)
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, on_interrupt)
+    except (NotImplementedError, RuntimeError):
+        pass  # No loop signal handlers (e.g. Windows): Ctrl-C interrupts at once.
+    async def monitor(name, tar):
+        # One monitor failing must not cancel the others (some may be mid-restore).
+        try:
+            await integrity_check_one(name, tar, check_interval, full_check_every, stop)
+        except Exception as e:
+            print(f"[ERROR] Integrity check for '{name}' stopped: {e}")
+
+    await asyncio.gather(*[monitor(name, tar) for name, tar in zip(names, snapshot_tars)])
+
+def continuous_integrity_check(container_names, snapshot_tars, check_interval=30, full_check_every=20):
+    """
+    Continuously monitor the integrity of one or more running containers.
+    Accepts a single name/tar or parallel lists of them.
+    """
+    if isinstance(container_names, str):
+        container_names = [container_names]
+    if isinstance(snapshot_tars, str):
+        snapshot_tars = [snapshot_tars] * len(container_names)
+    # One lookup for every container up front, instead of each monitor finding out alone.
+    states = bulk_inspect(container_names)
+    monitored = []
+    for name, tar in zip(container_names, snapshot_tars):
+        if name not in states:
+            # No baseline can be taken from a container that doesn't exist.
+            print(f"[WARN] Container '{name}' was not found; not monitoring it.")
+            continue
+        if states[name] != "running":
+            print(f"[WARN] Container '{name}' is {states[name]}, not running.")
+        monitored.append((name, tar))
+    if not monitored:
+        print("[ERROR] None of the given containers exist. Nothing to monitor.")
+        return
+    container_names, snapshot_tars = (list(t) for t in zip(*monitored))
+    try:
+        asyncio.run(run_all(container_names, snapshot_tars, check_interval, full_check_every))
+        print("[INFO] Continuous integrity check stopped.")
     except KeyboardInterrupt:
         print("\n[INFO] Continuous integrity check interrupted by user.")
 
@@ -405,6 +1175,24 @@ def continuous_integrity_check(container_name, snapshot_tar, check_interval=30):
 # 5. Web Container with Integrated ModSecurity WAF
 # -------------------------------------------------
 
+def pick_web_server_cmd(base_image):
+    """
+    Probe `base_image` once for a built-in web server and return the argv to run it
+    with, so the web container starts the server directly instead of via 'sh -c'.
+    """
+    try:
+        found = subprocess.check_output(
+            ["docker", "run", "--rm", base_image, "sh", "-c", "command -v python3 || command -v busybox || echo none"],
+            stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (subprocess.CalledProcessError, OSError):
+        found = "none"
+    if posixpath.basename(found) == "python3":
+        return [found, "-m", "http.server", "80"]
+    if posixpath.basename(found) == "busybox":
+        return [found, "httpd", "-f", "-p", "80"]
+    print(f"[WARN] No built-in web server found in '{base_image}'; the web container will idle.")
+    return ["sleep", "infinity"]
+
 def deploy_web_with_waf():
     """
     Deploy a web container (matching host OS) with integrated ModSecurity WAF.
@@ -418,20 +1206,31 @@ def deploy_web_with_waf():
     base_image = map_os_to_docker_image(os_name, version)
     print(f"[INFO] Detected OS: {os_name} (Version: {version}). Main web container base image: {base_image}")
     
-    # Pull required images
-    pull_docker_image(base_image)
+    # Pull required images; the two pulls are independent, so overlap them.
     waf_image = "owasp/modsecurity-crs:nginx"
-    pull_docker_image(waf_image)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(pull_docker_image, [base_image, waf_image]))
     
     # Create a dedicated network
     network_name = "ccdc-web-net"
-    try:
-        subprocess.check_call(["docker", "network", "inspect", network_name],
-                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = docker_api("GET", f"/networks/{network_name}")
+    if result is None:
+        try:
+            subprocess.check_call(["docker", "network", "inspect", network_name],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            print(f"[INFO] Docker network '{network_name}' already exists.")
+        except subprocess.CalledProcessError:
+            print(f"[INFO] Creating Docker network '{network_name}'.")
+            subprocess.check_call(["docker", "network", "create", network_name])
+    elif result[0] == 200:
         print(f"[INFO] Docker network '{network_name}' already exists.")
-    except subprocess.CalledProcessError:
+    else:
         print(f"[INFO] Creating Docker network '{network_name}'.")
-        subprocess.check_call(["docker", "network", "create", network_name])
+        result = docker_api("POST", "/networks/create", {"Name": network_name})
+        if result is None or result[0] != 201:
+            detail = result[1].decode("utf-8", "replace").strip() if result else "no response from Docker"
+            print(f"[ERROR] Could not create Docker network '{network_name}': {detail}")
+            sys.exit(1)
     
     # Ask user for container names, ports
     web_container = input("Enter the main web container name (default 'web_container'): ").strip() or "web_container"
@@ -442,10 +1241,10 @@ def deploy_web_with_waf():
     # Attempt to pick a built-in server command
     user = "nonroot" if os_name == "windows" else "nobody"
     if os_name == "windows":
-        server_cmd = "powershell.exe -Command \"Write-Host 'Starting minimal web server...'; while($true){echo 'HTTP/1.1 200 OK`r`n`r`nHello from Windows Container' | nc -l -p 80}\""
+        server_cmd = ["powershell.exe", "-Command", "Write-Host 'Starting minimal web server...'; while($true){echo 'HTTP/1.1 200 OK`r`n`r`nHello from Windows Container' | nc -l -p 80}"]
         container_port = "80"
     else:
-        server_cmd = "/bin/sh -c 'which python3 && python3 -m http.server 80 || (which busybox && busybox httpd -f -p 80 || echo \"No server found\" && sleep infinity)'"
+        server_cmd = pick_web_server_cmd(base_image)
         container_port = "80"
     
     # Launch web container
@@ -459,7 +1258,7 @@ def deploy_web_with_waf():
             "--network", network_name,
             "-p", f"{host_web_port}:{container_port}",
             base_image,
-            "sh", "-c", server_cmd
+            *server_cmd
         ])
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not launch main web container '{web_container}': {e}")
@@ -511,7 +1310,7 @@ def deploy_web_with_waf():
 # 6. Interactive Menu
 # -------------------------------------------------
 
-def interactive_menu():
+def interactive_menu(rehash_every=20):
     """Display an interactive menu for the user to choose an operation."""
     print("==== CCDC OS-to-Container & Integrity Tool ====")
     print("Select an option:")
@@ -529,8 +1328,15 @@ def interactive_menu():
         run_generic_container(os_name, base_image)
     elif choice == "2":
         print("[MODE 2] Running Continuous Integrity Check...")
-        container_name = input("Enter the container name to monitor: ").strip()
-        snapshot_tar = input("Enter the path to the snapshot .tar file for restoration: ").strip()
+        names_str = input("Enter the container name(s) to monitor (comma-separated): ").strip()
+        container_names = [n.strip() for n in names_str.split(",") if n.strip()]
+        tars_str = input("Enter the path(s) to the snapshot .tar file(s) for restoration (comma-separated, one per container or one for all): ").strip()
+        snapshot_tars = [t.strip() for t in tars_str.split(",") if t.strip()]
+        if not container_names or len(snapshot_tars) not in (1, len(container_names)):
+            print("[ERROR] Give one snapshot .tar for all containers, or one per container.")
+            sys.exit(1)
+        if len(snapshot_tars) == 1:
+            snapshot_tars *= len(container_names)
         check_interval_str = input("Enter integrity check interval in seconds (default 30): ").strip()
         try:
             check_interval = int(check_interval_str) if check_interval_str else 30
@@ -541,19 +1347,17 @@ def interactive_menu():
         base_image = map_os_to_docker_image(os_name, version)
         pull_docker_image(base_image)
         user = "nonroot" if os_name == "windows" else "nobody"
-        print(f"[INFO] Launching container '{container_name}' in detached mode as user '{user}' in read-only mode.")
-        try:
-            subprocess.check_call([
-                "docker", "run", "-d",
-                "--read-only",
-                "--user", user,
-                "--name", container_name,
-                base_image
-            ])
-        except subprocess.CalledProcessError as e:
-            print(f"[ERROR] Could not launch container '{container_name}': {e}")
-            sys.exit(1)
-        continuous_integrity_check(container_name, snapshot_tar, check_interval)
+        for container_name in container_names:
+            print(f"[INFO] Launching container '{container_name}' in detached mode as user '{user}' in read-only mode.")
+            try:
+                subprocess.check_call([*_DOCKER_RUN_RO, user, "--name", container_name, base_image])
+            except subprocess.CalledProcessError as e:
+                print(f"[ERROR] Could not launch container '{container_name}': {e}")
+                sys.exit(1)
+        for container_name, snapshot_tar in zip(container_names, snapshot_tars):
+            if not os.path.exists(snapshot_tar) and not create_snapshot(container_name, snapshot_tar):
+                sys.exit(1)
+        continuous_integrity_check(container_names, snapshot_tars, check_interval, rehash_every)
     elif choice == "3":
         print("[MODE 3] Deploying OS-based Web Container + Integrated ModSecurity WAF...")
         deploy_web_with_waf()
@@ -570,9 +1374,11 @@ def main():
         description="CCDC OS-to-Container & Integrity Tool: auto-installs Docker if missing, matches OS for container, integrates WAF."
     )
     parser.add_argument("--menu", action="store_true", help="Launch interactive menu")
+    parser.add_argument("--rehash-every", type=int, default=20, metavar="N",
+                        help="Integrity check: re-hash the whole container every N cycles (0 = never; default 20)")
     args = parser.parse_args()
     if args.menu:
-        interactive_menu()
+        interactive_menu(args.rehash_every)
     else:
         print("Usage: Run the script with '--menu' to launch the interactive menu.")
         sys.exit(0)
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+# requires: python>=3.7
 """
 ccdc_integrity_tool.py
 
@@ -8,100 +9,252 @@ import sys
 import platform
 import subprocess
 import argparse
+import asyncio
+import errno
+import functools
 import os
+import re
+import shlex
 import hashlib
 import time
 import shutil
+import socket
+import stat
+import tarfile
+import tempfile
+try:
+    import grp
+except ImportError:  # Windows; only the Linux purge uses it
+    grp = None
+
+if sys.version_info < (3, 7):
+    sys.exit("[ERROR] Python 3.7+ is required.")
 
 # -------------------------------------------------
 # 1. Docker & Docker Compose Auto-Installation
 # -------------------------------------------------
 
+# Environment for package-manager calls: noninteractive, so tzdata & co. never prompt.
+_INSTALL_ENV = {**os.environ, "DEBIAN_FRONTEND": "noninteractive", "TZ": "America/Denver"}
+
+# uname() results, read once at import.
+_SYSNAME = platform.system().lower()
+_RELEASE = platform.release().lower()
+
+def _classify_platform(sysname=_SYSNAME):
+    """Classify the host as 'linux', 'windows', 'bsd', 'nix' or 'other'."""
+    if sysname.startswith("linux"):
+        return "linux"
+    if sysname == "windows":
+        return "windows"
+    if sysname in ("freebsd", "openbsd", "netbsd"):
+        return "bsd"
+    if "nix" in sysname:
+        return "nix"
+    return "other"
+
+# Computed once; every platform branch below compares against this.
+_PLATFORM = _classify_platform()
+
+_DOCKER_SOCKET = "/var/run/docker.sock"
+
+# One /dev/null descriptor shared by every quiet child, instead of subprocess.DEVNULL
+# opening it afresh for each call.
+_DEVNULL_FD = os.open(os.devnull, os.O_RDWR)
+
+def _spawn_check_call(cmd, **kwargs):
+    """
+    subprocess.check_call for the bursty install/copy paths.
+    With an absolute executable path and close_fds=False, CPython starts the child
+    with posix_spawn (vfork) instead of fork+exec, so the cost no longer grows with
+    the parent's heap or fd limit. Python's own fds are non-inheritable by default,
+    so nothing extra leaks into the child.
+    """
+    executable = shutil.which(cmd[0]) or cmd[0]
+    return subprocess.check_call([executable, *cmd[1:]], close_fds=False, **kwargs)
+
+@functools.lru_cache(maxsize=1)
 def detect_linux_package_manager():
-    """Detect common Linux package managers."""
+    """Detect common Linux package managers (cached; the answer can't change mid-run)."""
     for pm in ["apt", "apt-get", "dnf", "yum", "zypper"]:
         if shutil.which(pm):
             return pm
     return None
 
-def attempt_install_docker_linux():
-    """Attempt to install Docker on Linux using a best-effort approach."""
+_APT_LISTS_DIR = "/var/lib/apt/lists"
+
+def _apt_metadata_fresh(max_age=3600):
+    """
+    Return True if the apt package lists were refreshed within max_age seconds,
+    so 'apt update' (a network round-trip per mirror) can be skipped.
+    """
+    try:
+        return time.time() - os.stat(_APT_LISTS_DIR).st_mtime < max_age
+    except OSError:
+        return False
+
+# Package names are given in their Debian form; the RPM/SUSE package for Docker is just 'docker'.
+_NON_APT_PACKAGE_NAMES = {"docker.io": "docker"}
+
+def _package_pins():
+    """
+    Parse DOCKERIZE_PACKAGE_PINS ('name=version,...', with names as the package manager
+    spells them) into a dict. Nothing is pinned by default: hard-coded versions go stale
+    as mirrors drop old builds, and a missing pinned version fails the whole install.
+    """
+    pins = {}
+    for item in os.environ.get("DOCKERIZE_PACKAGE_PINS", "").split(","):
+        name, sep, version = item.strip().partition("=")
+        if sep and name and version:
+            pins[name] = version
+    return pins
+
+def _pinned(pm, pkg, pins):
+    """Return pkg as an install argument, with its pinned version if one is set."""
+    version = pins.get(pkg)
+    if not version:
+        return pkg
+    return f"{pkg}-{version}" if pm in ("yum", "dnf") else f"{pkg}={version}"
+
+def install_linux_packages(pkgs):
+    """
+    Install the given packages in a single package-manager transaction:
+    one metadata refresh and one install, however many packages are requested.
+    Returns True on success.
+    """
     pm = detect_linux_package_manager()
     if not pm:
-        print("[ERROR] No recognized package manager found on Linux. Cannot auto-install Docker.")
+        print("[ERROR] No recognized package manager found on Linux. Cannot auto-install packages.")
         return False
+    if pm not in ("apt", "apt-get"):
+        pkgs = [_NON_APT_PACKAGE_NAMES.get(p, p) for p in pkgs]
+    # A pinned version spares the resolver from weighing every candidate.
+    pins = _package_pins()
+    install_args = [_pinned(pm, p, pins) for p in pkgs]
 
-    print(f"[INFO] Attempting to install Docker using '{pm}' on Linux...")
+    print(f"[INFO] Installing {' '.join(install_args)} using '{pm}' on Linux...")
     try:
-        env = os.environ.copy()
-        env["DEBIAN_FRONTEND"] = "noninteractive"
-        env["TZ"] = "America/Denver"
-
         if pm in ("apt", "apt-get"):
-            subprocess.check_call(["sudo", pm, "update", "-y"], env=env)
-            subprocess.check_call(["sudo", pm, "install", "-y", "docker.io"], env=env)
+            if _apt_metadata_fresh():
+                print("[INFO] Package lists are less than an hour old; skipping update.")
+            else:
+                _spawn_check_call(["sudo", pm, "update", "-y"], env=_INSTALL_ENV)
+            _spawn_check_call(["sudo", pm, "install", "-y", *install_args], env=_INSTALL_ENV)
         elif pm in ("yum", "dnf"):
-            subprocess.check_call(["sudo", pm, "-y", "install", "docker"], env=env)
-            subprocess.check_call(["sudo", "systemctl", "enable", "docker"], env=env)
-            subprocess.check_call(["sudo", "systemctl", "start", "docker"], env=env)
+            # yum/dnf already skip the refresh while their cache is within metadata_expire.
+            _spawn_check_call(["sudo", pm, "-y", "install", *install_args], env=_INSTALL_ENV)
         elif pm == "zypper":
-            subprocess.check_call(["sudo", "zypper", "refresh"], env=env)
-            subprocess.check_call(["sudo", "zypper", "--non-interactive", "install", "docker"], env=env)
-            subprocess.check_call(["sudo", "systemctl", "enable", "docker"], env=env)
-            subprocess.check_call(["sudo", "systemctl", "start", "docker"], env=env)
+            _spawn_check_call(["sudo", "zypper", "refresh"], env=_INSTALL_ENV)
+            _spawn_check_call(["sudo", "zypper", "--non-interactive", "install", *install_args], env=_INSTALL_ENV)
         else:
             print(f"[ERROR] Package manager '{pm}' is not fully supported for auto-installation.")
             return False
-
-        print("[INFO] Docker installation attempt completed. Checking if Docker is now available.")
+        # apt starts the daemon on install; the others need it enabled by hand.
+        if pm not in ("apt", "apt-get") and "docker" in pkgs:
+            ensure_docker_service()
         return True
     except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Auto-installation of Docker on Linux failed: {e}")
+        print(f"[ERROR] Package installation failed: {e}")
         return False
 
-def attempt_install_docker_compose_linux():
+def _docker_active():
+    """Return True if systemd reports the docker service as running."""
+    try:
+        return subprocess.run(["systemctl", "is-active", "--quiet", "docker"]).returncode == 0
+    except FileNotFoundError:
+        return False
+
+@functools.lru_cache(maxsize=1)
+def ensure_docker_service():
     """
-    Attempt to install Docker Compose on Linux (best effort).
-    We'll try apt-get or yum/dnf or zypper, similar to Docker auto-install logic,
-    also in noninteractive mode with TZ=America/Denver.
+    Enable and start the docker service unless it is already running.
+    Cached, so the install path and fix_docker_group don't both go through systemctl.
     """
-    pm = detect_linux_package_manager()
-    if not pm:
-        print("[ERROR] No recognized package manager found. Cannot auto-install Docker Compose.")
-        return False
-    
-    print(f"[INFO] Attempting to install Docker Compose using '{pm}' on Linux...")
+    if _docker_active():
+        return
     try:
-        env = os.environ.copy()
-        env["DEBIAN_FRONTEND"] = "noninteractive"
-        env["TZ"] = "America/Denver"
+        _spawn_check_call(["sudo", "systemctl", "enable", "--now", "docker"])
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        print(f"[WARN] Could not enable/start docker service: {e}")
 
-        if pm in ("apt", "apt-get"):
-            subprocess.check_call(["sudo", pm, "update", "-y"], env=env)
-            subprocess.check_call(["sudo", pm, "install", "-y", "docker-compose"], env=env)
-        elif pm in ("yum", "dnf"):
-            subprocess.check_call(["sudo", pm, "-y", "install", "docker-compose"], env=env)
-        elif pm == "zypper":
-            subprocess.check_call(["sudo", "zypper", "refresh"], env=env)
-            subprocess.check_call(["sudo", "zypper", "--non-interactive", "install", "docker-compose"], env=env)
-        else:
-            print(f"[ERROR] Package manager '{pm}' is not fully supported for Docker Compose auto-install.")
-            return False
-        
-        print("[INFO] Docker Compose installation attempt completed. Checking if it is now available.")
+def attempt_install_docker_linux():
+    """Attempt to install Docker on Linux using a best-effort approach."""
+    if _docker_binary():
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Auto-installation of Docker Compose on Linux failed: {e}")
+    print("[INFO] Attempting to install Docker on Linux...")
+    if not install_linux_packages(["docker.io"]):
+        print("[ERROR] Auto-installation of Docker on Linux failed.")
+        return False
+    print("[INFO] Docker installation attempt completed. Checking if Docker is now available.")
+    return True
+
+def attempt_install_docker_compose_linux():
+    """
+    Attempt to install Docker Compose on Linux (best effort),
+    in noninteractive mode with TZ=America/Denver like the Docker install.
+    """
+    if docker_compose_available():
+        return True
+    print("[INFO] Attempting to install Docker Compose on Linux...")
+    if not install_linux_packages(["docker-compose"]):
+        print("[ERROR] Auto-installation of Docker Compose on Linux failed.")
+        return False
+    print("[INFO] Docker Compose installation attempt completed. Checking if it is now available.")
+    return True
+
+def _docker_binary():
+    """
+    Return the path of the docker CLI, or None.
+    The usual install locations are probed first, saving a walk over every PATH entry.
+    """
+    for path in ("/usr/bin/docker", "/usr/local/bin/docker"):
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return shutil.which("docker")
+
+def _docker_ping():
+    """
+    Send 'GET /_ping' straight to the Docker socket.
+    Returns True if the daemon answers 200 OK, False otherwise.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(_DOCKER_SOCKET)
+            sock.sendall(b"GET /_ping HTTP/1.0\r\nHost: docker\r\n\r\n")
+            with sock.makefile("rb") as resp:
+                return b" 200 " in resp.readline()
+    except OSError:
         return False
 
 def can_run_docker():
-    """Return True if we can run 'docker ps' without error, else False."""
+    """Return True if we can talk to the Docker daemon, else False."""
+    # Probe the socket directly unless the CLI would be talking to something else.
+    docker_host = os.environ.get("DOCKER_HOST", "unix://" + _DOCKER_SOCKET)
+    if hasattr(socket, "AF_UNIX") and docker_host == "unix://" + _DOCKER_SOCKET and os.path.exists(_DOCKER_SOCKET):
+        return _docker_ping()
     try:
-        subprocess.check_call(["docker", "ps"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.check_call(["docker", "ps"], stdout=_DEVNULL_FD, stderr=_DEVNULL_FD)
         return True
     except:
         return False
 
+def wait_docker_ready(timeout=10):
+    """
+    Poll until the Docker daemon answers, for up to timeout seconds.
+    Returns False straight away if the socket exists but we lack permission on it,
+    since waiting won't help there; that case needs fix_docker_group().
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if os.path.exists(_DOCKER_SOCKET) and not os.access(_DOCKER_SOCKET, os.R_OK | os.W_OK):
+            return False
+        if can_run_docker():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.2)
+
 def fix_docker_group():
     """
     Attempt to add the current user to the 'docker' group, enable & start Docker,
@@ -118,82 +271,135 @@ def fix_docker_group():
         print(f"[WARN] Could not add user to docker group: {e}")
 
     # On Linux, attempt to enable/start Docker
-    if platform.system().lower().startswith("linux"):
-        try:
-            subprocess.check_call(["sudo", "systemctl", "enable", "docker"])
-            subprocess.check_call(["sudo", "systemctl", "start", "docker"])
-        except subprocess.CalledProcessError as e:
-            print(f"[WARN] Could not enable/start docker service: {e}")
+    if _PLATFORM == "linux":
+        ensure_docker_service()
 
     # Re-exec with 'sg docker' to avoid dropping user into an interactive shell
     print("[INFO] Re-executing script under 'sg docker' to activate group membership.")
-    os.environ["CCDC_DOCKER_GROUP_FIX"] = "1"  # Avoid infinite loops
+    new_env = {**os.environ, "CCDC_DOCKER_GROUP_FIX": "1"}  # Avoid infinite loops
     script_path = os.path.abspath(sys.argv[0])
-    script_args = sys.argv[1:]
-    command_line = f'export CCDC_DOCKER_GROUP_FIX=1; exec "{sys.executable}" "{script_path}" ' + " ".join(f'"{arg}"' for arg in script_args)
-    cmd = ["sg", "docker", "-c", command_line]
-    os.execvp("sg", cmd)
+    cmd_list = [sys.executable, script_path, *sys.argv[1:]]
+    # sg only takes a shell command string; quote each word so paths/args with spaces survive.
+    command_line = "exec " + " ".join(shlex.quote(c) for c in cmd_list)
+    os.execvpe("sg", ["sg", "docker", "-c", command_line], new_env)
+
+def _install_docker_on_linux():
+    """Auto-install Docker on Linux, then fix group membership if we still can't use it."""
+    # check_all_dependencies may already have installed it as part of a batch.
+    if not _docker_binary():
+        installed = attempt_install_docker_linux()
+        if not installed:
+            print("[ERROR] Could not auto-install Docker on Linux. Please install it manually.")
+            sys.exit(1)
+    # A freshly installed daemon may still be starting up.
+    if not wait_docker_ready():
+        fix_docker_group()
+    else:
+        print("[INFO] Docker is installed and accessible on Linux now.")
+
+_MANUAL_INSTALL_MESSAGES = {
+    "bsd": "Docker auto-install is not implemented for BSD in this script. Please install manually.",
+    "nix": "Docker auto-install is not implemented for Nix in this script. Please install manually.",
+    "windows": "Docker not found, and auto-install is not supported on Windows. Please install Docker or Docker Desktop manually.",
+}
+
+def _unsupported_platform():
+    """Report that Docker must be installed by hand on this platform, then exit."""
+    message = _MANUAL_INSTALL_MESSAGES.get(
+        _PLATFORM,
+        f"Unrecognized system '{_SYSNAME}'. Docker is missing. Please install it manually."
+    )
+    print(f"[ERROR] {message}")
+    sys.exit(1)
+
+_INSTALL_HANDLERS = {
+    "linux": _install_docker_on_linux,
+}
+
+def _pin_docker_host():
+    """
+    Point DOCKER_HOST at the local daemon so every docker child process skips
+    resolving the active CLI context. Left alone if the user chose a host or context.
+    """
+    if "DOCKER_HOST" in os.environ or "DOCKER_CONTEXT" in os.environ:
+        return
+    if os.path.isdir(os.path.expanduser("~/.docker/contexts")):
+        return  # a non-default context may be selected; let the CLI decide
+    if _PLATFORM == "windows":
+        host, path = "npipe:////./pipe/docker_engine", r"\\.\pipe\docker_engine"
+    else:
+        host, path = "unix://" + _DOCKER_SOCKET, _DOCKER_SOCKET
+    if os.path.exists(path):
+        os.environ["DOCKER_HOST"] = host
 
 def ensure_docker_installed():
     """
     Check if Docker is installed & if the user can run it.
     If missing, attempt auto-install. If the user isn't in docker group, fix that, then re-exec with sg.
     """
+    # Fast path: a reachable daemon socket means Docker is installed and usable,
+    # no need to spawn anything. Docker Desktop / rootless setups fall through.
+    try:
+        st = os.stat(_DOCKER_SOCKET)
+        if stat.S_ISSOCK(st.st_mode) and os.access(_DOCKER_SOCKET, os.R_OK | os.W_OK):
+            print("[INFO] Docker socket reachable.")
+            _pin_docker_host()
+            return
+    except OSError:
+        pass
+
     if "CCDC_DOCKER_GROUP_FIX" in os.environ:
         # Already tried group fix once. Let's see if we can run docker now.
-        if can_run_docker():
+        if wait_docker_ready():
             print("[INFO] Docker is accessible now after group fix.")
             return
         else:
             print("[ERROR] Docker still not accessible even after group fix. Exiting.")
             sys.exit(1)
 
-    docker_path = shutil.which("docker")
+    docker_path = _docker_binary()
     if docker_path and can_run_docker():
         print("[INFO] Docker is installed and accessible.")
+        _pin_docker_host()
         return
 
-    sysname = platform.system().lower()
-    if sysname.startswith("linux"):
-        installed = attempt_install_docker_linux()
-        if not installed:
-            print("[ERROR] Could not auto-install Docker on Linux. Please install it manually.")
-            sys.exit(1)
-        if not can_run_docker():
-            fix_docker_group()
-        else:
-            print("[INFO] Docker is installed and accessible on Linux now.")
-    elif "bsd" in sysname:
-        print("[ERROR] Docker auto-install is not implemented for BSD in this script. Please install manually.")
-        sys.exit(1)
-    elif "nix" in sysname:
-        print("[ERROR] Docker auto-install is not implemented for Nix in this script. Please install manually.")
-        sys.exit(1)
-    elif sysname == "windows":
-        print("[ERROR] Docker not found, and auto-install is not supported on Windows. Please install Docker or Docker Desktop manually.")
-        sys.exit(1)
-    else:
-        print(f"[ERROR] Unrecognized system '{sysname}'. Docker is missing. Please install it manually.")
-        sys.exit(1)
+    _INSTALL_HANDLERS.get(_PLATFORM, _unsupported_platform)()
 
-def check_docker_compose():
-    """Check if Docker Compose is installed. If not, try to auto-install on Linux."""
-    try:
-        subprocess.check_call(["docker-compose", "--version"],
-                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+# Where the docker CLI looks for plugins such as 'docker compose' and 'docker buildx'.
+_CLI_PLUGIN_DIRS = (
+    "/usr/libexec/docker/cli-plugins",
+    "/usr/local/libexec/docker/cli-plugins",
+    "/usr/lib/docker/cli-plugins",
+    "/usr/local/lib/docker/cli-plugins",
+)
+
+def cli_plugin_installed(name):
+    """Return True if the docker CLI plugin 'docker-<name>' is installed system-wide or for this user."""
+    dirs = (*_CLI_PLUGIN_DIRS, os.path.expanduser("~/.docker/cli-plugins"))
+    return any(os.path.exists(os.path.join(d, f"docker-{name}")) for d in dirs)
+
+def docker_compose_available():
+    """Return True if the docker-compose binary or the Compose CLI plugin is installed."""
+    return bool(shutil.which("docker-compose")) or cli_plugin_installed("compose")
+
+def check_docker_compose(available=None):
+    """
+    Check if Docker Compose is installed. If not, try to auto-install on Linux.
+    Pass `available` to reuse a docker_compose_available() result already taken.
+    """
+    if available is None:
+        available = docker_compose_available()
+    if available:
         print("[INFO] Docker Compose is installed.")
-    except Exception:
+    else:
         print("[WARN] Docker Compose not found. Attempting auto-install (Linux only).")
-        sysname = platform.system().lower()
-        if sysname.startswith("linux"):
+        if _PLATFORM == "linux":
             installed = attempt_install_docker_compose_linux()
             if installed:
-                try:
-                    # Verify again
-                    subprocess.check_call(["docker-compose", "--version"],
-                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                # Verify again
+                if docker_compose_available():
                     print("[INFO] Docker Compose installed successfully.")
-                except:
+                else:
                     print("[ERROR] Docker Compose still not available after attempted install.")
             else:
                 print("[ERROR] Could not auto-install Docker Compose on Linux. Please install manually.")
@@ -204,26 +410,33 @@ def check_docker_compose():
 # 2. Python & Docker Checks
 # -------------------------------------------------
 
-#def check_python_version(min_major=3, min_minor=7):
-#    """Ensure Python 3.7+ is being used."""
-#    if sys.version_info < (min_major, min_minor):
-#        print(f"[ERROR] Python {min_major}.{min_minor}+ is required. You are running {sys.version_info.major}.{sys.version_info.minor}.")
-#        sys.exit(1)
-#    else:
-#        print(f"[INFO] Python version check passed: {sys.version_info.major}.{sys.version_info.minor}.")
-
 def check_wsl_if_windows():
     """On Windows, check for WSL if needed (for non-Docker Desktop)."""
-    if platform.system().lower() == "windows":
+    if _PLATFORM == "windows":
         try:
-            subprocess.check_call(["wsl", "--version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            subprocess.check_call(["wsl", "--version"], stdout=_DEVNULL_FD, stderr=_DEVNULL_FD)
             print("[INFO] WSL is installed.")
         except Exception:
             print("[WARN] WSL not found. Running Docker containers as non-root on legacy Windows may require custom images.")
 
+def install_missing_linux_packages():
+    """
+    On Linux, install whichever of Docker and Docker Compose are missing in one
+    package-manager run (one metadata refresh, one install) instead of one per tool.
+    """
+    if _PLATFORM != "linux":
+        return
+    missing = []
+    if not _docker_binary():
+        missing.append("docker.io")
+    if not docker_compose_available():
+        missing.append("docker-compose")
+    if missing:
+        install_linux_packages(missing)
+
 def check_all_dependencies():
-    """Run all prerequisite checks."""
-    #check_python_version(3, 7)
+    """Run all prerequisite checks. (The Python version is checked once at import.)"""
+    install_missing_linux_packages()
     ensure_docker_installed()
     check_docker_compose()
     check_wsl_if_windows()
@@ -232,119 +445,176 @@ def check_all_dependencies():
 # 3. OS Detection & Docker Image Mapping
 # -------------------------------------------------
 
+# Only the two fields detect_os needs; the rest of the file is never split or stored.
+_OS_RELEASE_RE = re.compile(r'^(NAME|VERSION_ID)="?([^"\n]*)"?', re.M)
+
+def _read_os_release():
+    """Return the /etc/os-release fields, using the stdlib parser on Python 3.10+."""
+    try:
+        return platform.freedesktop_os_release()
+    except AttributeError:
+        pass
+    os_info = {}
+    with open("/etc/os-release") as f:
+        for line in f:
+            m = _OS_RELEASE_RE.match(line)
+            if m:
+                os_info[m.group(1)] = m.group(2)
+                if len(os_info) == 2:
+                    break
+    return os_info
+
+@functools.lru_cache(maxsize=1)
 def detect_os():
     """Detect the host OS and version. Best-effort for Linux, BSD, Nix, Windows."""
-    sysname = platform.system().lower()
-    if sysname.startswith("linux"):
+    if _PLATFORM == "linux":
         try:
-            with open("/etc/os-release") as f:
-                lines = f.readlines()
-            os_info = {}
-            for line in lines:
-                if "=" in line:
-                    key, value = line.strip().split("=", 1)
-                    os_info[key.lower()] = value.strip('"').lower()
-            os_name = os_info.get("name", "linux")
-            version_id = os_info.get("version_id", "")
+            os_info = _read_os_release()
+            os_name = os_info.get("NAME", "linux").lower()
+            version_id = os_info.get("VERSION_ID", "")
             return os_name, version_id
-        except:
+        except OSError:
             return "linux", ""
-    elif sysname.startswith("freebsd") or sysname.startswith("openbsd") or sysname.startswith("netbsd"):
+    elif _PLATFORM == "bsd":
         return "bsd", ""
-    elif "nix" in sysname:
+    elif _PLATFORM == "nix":
         return "nix", ""
-    elif sysname == "windows":
-        version = platform.release().lower()
+    elif _PLATFORM == "windows":
+        version = _RELEASE
         return "windows", version
     else:
-        return sysname, ""
-
+        return _SYSNAME, ""
+
+_LINUX_MAP = {
+    "centos": {
+        "6": "centos:6",
+        "7": "centos:7",
+        "8": "centos:8",
+        "9": "centos:stream9",
+        "": "ubuntu:latest"
+    },
+    "ubuntu": {
+        "14": "ubuntu:14.04",
+        "16": "ubuntu:16.04",
+        "18": "ubuntu:18.04",
+        "20": "ubuntu:20.04",
+        "22": "ubuntu:22.04"
+    },
+    "debian": {
+        "7": "debian:7",
+        "8": "debian:8",
+        "9": "debian:9",
+        "10": "debian:10",
+        "11": "debian:11",
+        "12": "debian:12"
+    },
+    "fedora": {
+        "25": "fedora:25",
+        "26": "fedora:26",
+        "27": "fedora:27",
+        "28": "fedora:28",
+        "29": "fedora:29",
+        "30": "fedora:30",
+        "31": "fedora:31",
+        "35": "fedora:35"
+    },
+    "opensuse leap": {
+        "15": "opensuse/leap:15"
+    },
+    "opensuse tumbleweed": {
+        "": "opensuse/tumbleweed"
+    },
+    "linux": {
+        "": "ubuntu:latest"
+    }
+}
+_WINDOWS_MAP = {
+    "xp":      "legacy-windows/xp:latest",
+    "vista":   "legacy-windows/vista:latest",
+    "7":       "legacy-windows/win7:latest",
+    "2008":    "legacy-windows/win2008:latest",
+    "2012":    "legacy-windows/win2012:latest",
+    "10":      "mcr.microsoft.com/windows/nanoserver:1809",
+    "2016":    "mcr.microsoft.com/windows/servercore:2016",
+    "2019":    "mcr.microsoft.com/windows/servercore:ltsc2019",
+    "2022":    "mcr.microsoft.com/windows/servercore:ltsc2022"
+}
+
+def _alternation(keys):
+    """Compile keys into one regex, longest first so no key can shadow a longer one it prefixes."""
+    return re.compile("|".join(re.escape(k) for k in sorted(keys, key=len, reverse=True)))
+
+# Built from the map keys, so the tables above are the only list to edit.
+# "linux" is the catch-all and is never searched for.
+_DISTRO_RE = _alternation(k for k in _LINUX_MAP if k != "linux")
+_WINDOWS_VERSION_RE = _alternation(_WINDOWS_MAP)
+
+@functools.lru_cache(maxsize=32)
 def map_os_to_docker_image(os_name, version):
     """Map the detected OS to a recommended Docker base image (best-effort)."""
-    linux_map = {
-        "centos": {
-            "6": "centos:6",
-            "7": "centos:7",
-            "8": "centos:8",
-            "9": "centos:stream9",
-            "": "ubuntu:latest"
-        },
-        "ubuntu": {
-            "14": "ubuntu:14.04",
-            "16": "ubuntu:16.04",
-            "18": "ubuntu:18.04",
-            "20": "ubuntu:20.04",
-            "22": "ubuntu:22.04"
-        },
-        "debian": {
-            "7": "debian:7",
-            "8": "debian:8",
-            "9": "debian:9",
-            "10": "debian:10",
-            "11": "debian:11",
-            "12": "debian:12"
-        },
-        "fedora": {
-            "25": "fedora:25",
-            "26": "fedora:26",
-            "27": "fedora:27",
-            "28": "fedora:28",
-            "29": "fedora:29",
-            "30": "fedora:30",
-            "31": "fedora:31",
-            "35": "fedora:35"
-        },
-        "opensuse leap": {
-            "15": "opensuse/leap:15"
-        },
-        "opensuse tumbleweed": {
-            "": "opensuse/tumbleweed"
-        },
-        "linux": {
-            "": "ubuntu:latest"
-        }
-    }
-    windows_map = {
-        "xp":      "legacy-windows/xp:latest",
-        "vista":   "legacy-windows/vista:latest",
-        "7":       "legacy-windows/win7:latest",
-        "2008":    "legacy-windows/win2008:latest",
-        "2012":    "legacy-windows/win2012:latest",
-        "10":      "mcr.microsoft.com/windows/nanoserver:1809",
-        "2016":    "mcr.microsoft.com/windows/servercore:2016",
-        "2019":    "mcr.microsoft.com/windows/servercore:ltsc2019",
-        "2022":    "mcr.microsoft.com/windows/servercore:ltsc2022"
-    }
     if os_name == "bsd":
         return "alpine:latest"
     elif os_name == "nix":
         return "alpine:latest"
     elif os_name == "windows":
-        for k, img in windows_map.items():
-            if k in version:
-                return img
+        m = _WINDOWS_VERSION_RE.search(version)
+        if m:
+            return _WINDOWS_MAP[m.group(0)]
         return "mcr.microsoft.com/windows/servercore:ltsc2019"
     else:
-        # assume some Linux distro
-        for distro, ver_map in linux_map.items():
-            if distro in os_name:
-                short_ver = version.split(".")[0] if version else ""
-                if short_ver in ver_map:
-                    return ver_map[short_ver]
-                if "" in ver_map:
-                    return ver_map[""]
-                return "ubuntu:latest"
-        return "ubuntu:latest"
+        # assume some Linux distro; anything unrecognized falls back to _LINUX_MAP["linux"]
+        m = _DISTRO_RE.search(os_name)
+        if not m:
+            return "ubuntu:latest"
+        ver_map = _LINUX_MAP[m.group(0)]
+        short_ver = version.split(".")[0]
+        return ver_map.get(short_ver) or ver_map.get("", "ubuntu:latest")
+
+def host_base_image():
+    """
+    Return (os_name, version, base_image) for this host.
+    detect_os and map_os_to_docker_image are both memoized, so repeated menu
+    actions get the answer without re-reading /etc/os-release or re-matching.
+    """
+    os_name, version = detect_os()
+    return os_name, version, map_os_to_docker_image(os_name, version)
 
 # -------------------------------------------------
 # 4. Container Launch & Integrity Checking
 # -------------------------------------------------
 
+def image_present(image):
+    """Return True if image is already in the local image store."""
+    return subprocess.run(["docker", "image", "inspect", image],
+                          stdout=_DEVNULL_FD, stderr=_DEVNULL_FD).returncode == 0
+
+def registry_mirror_source(image):
+    """
+    Return where to pull image from: behind DOCKERIZE_REGISTRY_MIRROR (e.g. 'mirror.corp:5000')
+    if that is set and image is a Docker Hub image, else image itself.
+    """
+    mirror = os.environ.get("DOCKERIZE_REGISTRY_MIRROR", "").rstrip("/")
+    if not mirror:
+        return image
+    first, sep, _ = image.partition("/")
+    if sep and ("." in first or ":" in first or first == "localhost"):
+        return image  # already names a registry
+    return f"{mirror}/{image if sep else 'library/' + image}"
+
 def pull_docker_image(image):
-    """Pull the specified Docker image."""
+    """
+    Pull the specified Docker image, unless it is already present locally.
+    Mirrored pulls are tagged with the original name so later 'docker run's find them.
+    """
+    if image_present(image):
+        print(f"[INFO] Image '{image}' is already present locally. Skipping pull.")
+        return
+    source = registry_mirror_source(image)
     try:
-        print(f"[INFO] Pulling Docker image: {image}")
-        subprocess.check_call(["docker", "pull", image])
+        print(f"[INFO] Pulling Docker image: {source}")
+        subprocess.check_call(["docker", "pull", source])
+        if source != image:
+            subprocess.check_call(["docker", "tag", source, image])
         print(f"[INFO] Successfully pulled image: {image}")
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Could not pull image '{image}': {e}")
@@ -485,9 +755,8 @@ def maybe_apply_read_only_and_nonroot(cmd_list):
     """
     read_only = input("Should this container run in read-only mode? (y/n) [n]: ").strip().lower() == "y"
     if read_only:
-        sysname = platform.system().lower()
         cmd_list.append("--read-only")
-        if not sysname.startswith("windows"):
+        if _PLATFORM != "windows":
             cmd_list.extend(["--user", "nobody"])
     return cmd_list
 
@@ -527,7 +796,7 @@ def setup_docker_db():
     if network_name != "bridge":
         try:
             subprocess.check_call(["docker", "network", "inspect", network_name],
-                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                                  stdout=_DEVNULL_FD, stderr=_DEVNULL_FD)
             print(f"[INFO] Using existing network '{network_name}'.")
         except subprocess.CalledProcessError:
             print(f"[INFO] Creating Docker network '{network_name}'.")
@@ -572,7 +841,7 @@ def setup_docker_waf():
     if network_name != "bridge":
         try:
             subprocess.check_call(["docker", "network", "inspect", network_name],
-                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                                  stdout=_DEVNULL_FD, stderr=_DEVNULL_FD)
             print(f"[INFO] Using existing network '{network_name}'.")
         except subprocess.CalledProcessError:
             print(f"[INFO] Creating Docker network '{network_name}'.")
@@ -637,7 +906,7 @@ def deploy_entire_web_stack_legacy():
     # Create network if not exists
     try:
         subprocess.check_call(["docker", "network", "inspect", network_name],
-                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                              stdout=_DEVNULL_FD, stderr=_DEVNULL_FD)
         print(f"[INFO] Docker network '{network_name}' already exists.")
     except subprocess.CalledProcessError:
         print(f"[INFO] Creating Docker network '{network_name}'.")
@@ -852,8 +1121,7 @@ def containerize_service():
     check_all_dependencies()
     
     # Determine base image using host OS info
-    os_name, version = detect_os()
-    base_image = map_os_to_docker_image(os_name, version)
+    os_name, version, base_image = host_base_image()
     print(f"[INFO] Using base Docker image: {base_image}")
 
     build_context = "container_build_context"
@@ -1053,8 +1321,7 @@ def advanced_os_containerize_service():
     so it won't fail if e.g. /etc/httpd is missing.
     """
     check_all_dependencies()
-    os_name, version = detect_os()
-    base_image = map_os_to_docker_image(os_name, version)
+    os_name, version, base_image = host_base_image()
     print(f"[INFO] Advanced OS-based containerization. Using base image: {base_image}")
 
     build_context = "advanced_os_build_context"
@@ -1065,16 +1332,14 @@ def advanced_os_containerize_service():
 
     # 1) Attempt to detect installed packages (best-effort).
     packages_to_install = []
-    sysname = platform.system().lower()
-
-    if sysname.startswith("linux"):
+    if _PLATFORM == "linux":
         if shutil.which("rpm"):
             # Check for some typical RPM packages
             common_rpm_packages = ["httpd", "php", "php-mysql", "mariadb-server"]
             for pkg in common_rpm_packages:
                 try:
                     ret = subprocess.call(["rpm", "-q", pkg],
-                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                                          stdout=_DEVNULL_FD, stderr=_DEVNULL_FD)
                     if ret == 0:
                         packages_to_install.append(pkg)
                 except:
@@ -1085,7 +1350,7 @@ def advanced_os_containerize_service():
             for pkg in common_deb_packages:
                 try:
                     ret = subprocess.call(["dpkg", "-l", pkg],
-                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                                          stdout=_DEVNULL_FD, stderr=_DEVNULL_FD)
                     if ret == 0:
                         packages_to_install.append(pkg)
                 except:
@@ -1208,9 +1473,418 @@ CMD ["httpd", "-D", "FOREGROUND"]
     else:
         print("[INFO] Build completed. You can run the image later using 'docker run'.")
 
+# -------------------------------------------------
+# 9A. Host Website Files -> Read-Only Container
+# -------------------------------------------------
+
+# Runs inside the base image right after the website files are unpacked.
+# Installs a web server with whatever package manager the image ships with, then drops
+# the downloaded indexes/packages so they aren't committed into the image.
+# ('clean packages' rather than 'clean all', which would also drop the rpm metadata.)
+_INSTALL_WEB_SERVER_SCRIPT = (
+    "if command -v apt-get >/dev/null 2>&1; then "
+    "apt-get update && DEBIAN_FRONTEND=noninteractive apt-get install -y --no-install-recommends apache2 "
+    "&& rm -rf /var/lib/apt/lists/*; "
+    "elif command -v dnf >/dev/null 2>&1; then dnf -y install httpd && dnf clean packages; "
+    "elif command -v yum >/dev/null 2>&1; then yum -y install httpd && yum clean packages; "
+    "elif command -v zypper >/dev/null 2>&1; then zypper --non-interactive install apache2 && zypper clean; "
+    "elif command -v apk >/dev/null 2>&1; then apk add --no-cache apache2; "
+    "else echo 'No supported package manager found in container.' >&2; exit 1; fi"
+)
+
+# Run in the build after the install: link whichever server binary the image has
+# (apache2ctl on Debian/SUSE, httpd on RHEL/Alpine) to one fixed path, so the image
+# CMD starts it directly instead of probing on every start.
+_FIND_WEB_SERVER_SCRIPT = "command -v apache2ctl || command -v httpd"
+_WEB_SERVER_LINK = "/usr/local/bin/web-server"
+
+# The container runs as 'nobody', which can't bind ports below 1024, so after the
+# host config is added move Apache's Listen/VirtualHost ports 80 and 443 up to
+# 8080 and 8443.
+_WEB_HTTP_PORT = 8080
+_UNPRIVILEGED_PORTS_SCRIPT = (
+    "for d in /etc/apache2 /etc/httpd; do [ -d \"$d\" ] || continue; "
+    "find \"$d\" -type f -name '*.conf' -exec sed -i -E "
+    "-e 's/^([[:space:]]*Listen[[:space:]]+([^[:space:]]*:)?)80([[:space:]]|$)/\\18080\\3/' "
+    "-e 's/^([[:space:]]*Listen[[:space:]]+([^[:space:]]*:)?)443([[:space:]]|$)/\\18443\\3/' "
+    "-e 's/(<VirtualHost[^>]*:)80>/\\18080>/' "
+    "-e 's/(<VirtualHost[^>]*:)443>/\\18443>/' {} +; done"
+)
+
+_WEB_DOCKERFILE = """\
+FROM {base_image}
+RUN {install} && mkdir -p /usr/local/bin && ln -sf "$({find})" {link}
+ADD website.tar /
+RUN {ports}
+EXPOSE {port}
+CMD ["{link}", "-D", "FOREGROUND"]
+"""
+
+# With a read-only root, Apache still needs somewhere to write its pid file, lock
+# files and logs (Debian, RHEL and Alpine layouts).
+_WEB_TMPFS_DIRS = ("/run/apache2", "/run/httpd", "/run/lock", "/var/log/apache2", "/var/log/httpd", "/tmp")
+
+# Website trees can hold GBs (MySQL data), so move file bodies into archives 1 MiB at a
+# time rather than tarfile's 16 KiB default; the same size is used for pipe writes.
+# (TarFile only takes copybufsize from Python 3.8 on.)
+_TAR_BUFSIZE = 1 << 20
+_TAR_COPY_KWARGS = {"copybufsize": _TAR_BUFSIZE} if sys.version_info >= (3, 8) else {}
+
+# Host paths that make up a typical Apache/PHP/MySQL website.
+_WEBSITE_PATHS = (
+    "/var/lib/mysql",
+    "/etc/httpd",
+    "/etc/apache2",
+    "/var/www/html",
+    "/etc/php",
+    "/etc/ssl",
+    "/var/log/apache2",
+    "/var/log/httpd",
+)
+
+def paths_that_exist(paths):
+    """
+    Return the entries of paths that exist, in order.
+    Paths are grouped by parent directory so each parent is listed once with
+    os.scandir instead of stat-ing every path separately.
+    """
+    parent_to_names = {}
+    for path in paths:
+        parent, name = os.path.split(path.rstrip("/"))
+        parent_to_names.setdefault(parent, set()).add(name)
+    present = set()
+    for parent, names in parent_to_names.items():
+        try:
+            with os.scandir(parent) as it:
+                present.update(os.path.join(parent, e.name) for e in it if e.name in names)
+        except OSError:
+            continue
+    return [p for p in paths if p.rstrip("/") in present]
+
+@functools.lru_cache(maxsize=1)
+def existing_website_paths():
+    """Return the _WEBSITE_PATHS present on this host (scanned once per run)."""
+    return tuple(paths_that_exist(_WEBSITE_PATHS))
+
+def add_tree_to_tar(tar, host_path):
+    """
+    Add host_path (recursively) to an open tarfile under its absolute path,
+    skipping special files and anything we don't have permission to read.
+    Directories are listed with os.scandir; its entries know their type from
+    readdir on most filesystems, so telling files, links and directories from
+    special files usually costs no stat call at all.
+    """
+    pending = [host_path]
+    while pending:
+        root = pending.pop()
+        try:
+            tar.add(root, arcname=root.lstrip("/"), recursive=False)
+            entries = os.scandir(root)
+        except (PermissionError, FileNotFoundError) as e:
+            print(f"[WARN] Could not archive directory '{root}': {e}")
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        continue
+                    if not (entry.is_file(follow_symlinks=False) or entry.is_symlink()):
+                        continue  # socket, FIFO or device node
+                except OSError:
+                    continue
+                try:
+                    tar.add(entry.path, arcname=entry.path.lstrip("/"), recursive=False)
+                except (PermissionError, FileNotFoundError) as e:
+                    print(f"[WARN] Could not archive '{entry.path}': {e}")
+
+@functools.lru_cache(maxsize=1)
+def _gnu_tar():
+    """Return the path of GNU tar, or None (busybox tar and bsdtar lack the flags used below)."""
+    tar = shutil.which("tar")
+    if not tar:
+        return None
+    try:
+        version = subprocess.run([tar, "--version"], stdout=subprocess.PIPE, stderr=_DEVNULL_FD).stdout
+    except OSError:
+        return None
+    return tar if b"GNU tar" in version else None
+
+def gnu_tar_create_argv(paths, output="-"):
+    """
+    Return argv for GNU tar archiving paths (relative to '/') into output, or None if
+    GNU tar isn't available. Unreadable files are skipped and mounts aren't crossed.
+    """
+    tar = _gnu_tar()
+    if not tar:
+        return None
+    return [tar, "-cf", output, "--ignore-failed-read", "--one-file-system",
+            "-C", "/", *(p.lstrip("/") for p in paths)]
+
+def report_gnu_tar_status(returncode):
+    """Return True if GNU tar's exit code means the archive is usable."""
+    # 1 only means files changed while being read (e.g. live logs); 2 is a real failure.
+    if returncode == 1:
+        print("[WARN] Some files changed while they were being archived.")
+    elif returncode > 1:
+        print(f"[ERROR] tar failed (exit code {returncode}).")
+    return returncode <= 1
+
+def stream_paths_as_tar(proc, paths, what):
+    """
+    Write paths as one tar archive to proc's stdin, close it, and return proc's exit code.
+    'what' names the receiving process in the error printed if it exits early.
+    The archive is written sequentially on purpose: one stream is unpacked by one
+    receiver, which beats any number of per-file 'docker cp' calls run in parallel.
+    """
+    try:
+        tar = tarfile.open(fileobj=proc.stdin, mode="w|", bufsize=_TAR_BUFSIZE, **_TAR_COPY_KWARGS)
+        for host_path in paths:
+            print(f"[INFO] Adding '{host_path}' to the {what}.")
+            add_tree_to_tar(tar, host_path)
+        tar.close()
+    except BrokenPipeError:
+        print(f"[ERROR] The {what} exited before all website files were sent.")
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+    return proc.wait()
+
+def port_in_use(port):
+    """
+    Return True if a TCP port on the host is already taken, on IPv4 or IPv6.
+    SO_REUSEADDR keeps leftover TIME_WAIT connections from counting as taken, and
+    only EADDRINUSE counts: an unprivileged port-80 probe fails with EACCES even
+    though the Docker daemon can still publish it.
+    """
+    probes = [(socket.AF_INET, "0.0.0.0")]
+    if socket.has_ipv6:
+        probes.append((socket.AF_INET6, "::"))
+    for family, addr in probes:
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as s:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if family == socket.AF_INET6:
+                    s.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+                s.bind((addr, port))
+        except OSError as e:
+            if e.errno == errno.EADDRINUSE:
+                return True
+    return False
+
+def find_free_port():
+    """Return a TCP port that is free right now, as picked by the kernel."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("", 0))
+        return s.getsockname()[1]
+
+def build_and_run_readonly_container(base_image, existing_paths=None):
+    """
+    Build an image from base_image that carries the host website files plus a web server,
+    then launch it in read-only + non-root mode.
+
+    The files are packed into one tar in a temporary build context and the image is
+    made by a single 'docker build' from a generated Dockerfile (ADD keeps the files'
+    ownership), instead of driving a container through run/commit/rm by hand.
+
+    existing_paths, if given, is the already-checked subset of _WEBSITE_PATHS present on the host.
+    """
+    if existing_paths is None:
+        existing_paths = existing_website_paths()
+    for host_path in _WEBSITE_PATHS:
+        if host_path not in existing_paths:
+            print(f"[WARN] '{host_path}' does not exist. Skipping.")
+    if not existing_paths:
+        print("[ERROR] No website-related files found on this host. Nothing to containerize.")
+        return
+
+    image_name = input("Enter the name for the new image (default 'web_readonly_image'): ").strip() or "web_readonly_image"
+
+    # The web server is installed before the files are added, so the install layer
+    # stays in the build cache and later rebuilds only redo the ADD.
+    context_dir = tempfile.mkdtemp()
+    try:
+        print("[INFO] Archiving website files into the build context...")
+        tar_path = os.path.join(context_dir, "website.tar")
+        tar_argv = gnu_tar_create_argv(existing_paths, tar_path)
+        if tar_argv:
+            # The tar binary walks and copies the trees in C.
+            if not report_gnu_tar_status(subprocess.run(tar_argv).returncode):
+                return
+        else:
+            with tarfile.open(tar_path, "w", **_TAR_COPY_KWARGS) as tar:
+                for host_path in existing_paths:
+                    print(f"[INFO] Adding '{host_path}' to the build context.")
+                    add_tree_to_tar(tar, host_path)
+        with open(os.path.join(context_dir, "Dockerfile"), "w") as f:
+            f.write(_WEB_DOCKERFILE.format(
+                base_image=base_image,
+                install=_INSTALL_WEB_SERVER_SCRIPT,
+                find=_FIND_WEB_SERVER_SCRIPT,
+                link=_WEB_SERVER_LINK,
+                ports=_UNPRIVILEGED_PORTS_SCRIPT,
+                port=_WEB_HTTP_PORT,
+            ))
+        # Use BuildKit when its CLI plugin is there; newer engines refuse DOCKER_BUILDKIT=1 without it.
+        build_env = {**os.environ, "DOCKER_BUILDKIT": "1"} if cli_plugin_installed("buildx") else None
+        print(f"[INFO] Building '{image_name}' from '{base_image}'...")
+        subprocess.check_call(["docker", "build", "-t", image_name, context_dir], env=build_env)
+        print(f"[INFO] Image '{image_name}' built.")
+    except subprocess.CalledProcessError as e:
+        print(f"[ERROR] Could not build image '{image_name}': {e}")
+        return
+    finally:
+        shutil.rmtree(context_dir, ignore_errors=True)
+
+    container_name = prompt_for_container_name("web_readonly")
+    host_port = input("Enter host port to publish the web server on (default '80'): ").strip() or "80"
+    while not (host_port.isdigit() and 0 < int(host_port) < 65536) or port_in_use(int(host_port)):
+        free_port = str(find_free_port())
+        if not sys.stdin.isatty():
+            # Nobody to ask: take the free port instead of looping on input().
+            print(f"[WARN] Port '{host_port}' is invalid or already in use. Using free port {free_port}.")
+            host_port = free_port
+            break
+        host_port = input(
+            f"[WARN] Port '{host_port}' is invalid or already in use. "
+            f"Enter another host port (default '{free_port}'): "
+        ).strip() or free_port
+
+    print(f"[INFO] Launching '{container_name}' in read-only + non-root mode on port {host_port} => {_WEB_HTTP_PORT}.")
+    tmpfs_args = [arg for path in _WEB_TMPFS_DIRS for arg in ("--tmpfs", path)]
+    try:
+        subprocess.check_call([
+            "docker", "run", "-d",
+            "--read-only",
+            *tmpfs_args,
+            "--user", "nobody",
+            "--name", container_name,
+            "-p", f"{host_port}:{_WEB_HTTP_PORT}",
+            image_name
+        ])
+        print(f"[INFO] Container '{container_name}' is running from image '{image_name}'.")
+    except subprocess.CalledProcessError as e:
+        print(f"[ERROR] Could not run container '{container_name}': {e}")
+
+async def _pull_and_scan_website_paths(image, *side_checks):
+    """
+    Pull image while checking which website paths exist on the host.
+    The path scan and any side_checks (blocking callables) run in the default
+    executor, hidden under the pull's network wait. side_checks must not install
+    anything or prompt: they share the terminal with the pull's progress output.
+    Returns the existing paths and a list of the side_checks' results.
+    """
+    loop = asyncio.get_running_loop()
+    pull = None
+    if await loop.run_in_executor(None, image_present, image):
+        print(f"[INFO] Image '{image}' is already present locally. Skipping pull.")
+    else:
+        source = registry_mirror_source(image)
+        print(f"[INFO] Pulling Docker image: {source}")
+        pull = await asyncio.create_subprocess_exec("docker", "pull", source)
+    checks = asyncio.gather(*(loop.run_in_executor(None, check) for check in side_checks))
+    found = await loop.run_in_executor(None, existing_website_paths)
+    results = await checks
+    if pull is None:
+        return found, results
+    if await pull.wait() != 0:
+        print(f"[ERROR] Could not pull image '{image}' (exit code {pull.returncode}).")
+    elif source != image and subprocess.run(["docker", "tag", source, image]).returncode != 0:
+        print(f"[ERROR] Could not tag '{source}' as '{image}'.")
+    else:
+        print(f"[INFO] Successfully pulled image: {image}")
+    return found, results
+
+def option_comprehensive():
+    """
+    Option 1: Build a new read-only container matching the host OS,
+    carrying the host's website files.
+    """
+    # Checks that may install something (and so prompt for sudo) stay out of the pull's
+    # progress output: packages and Docker come first, and Compose is only detected
+    # beside the pull, then installed after it finishes if it was missing.
+    install_missing_linux_packages()
+    ensure_docker_installed()
+    os_name, version, base_image = host_base_image()
+    print(f"[INFO] Detected OS: {os_name} (Version: {version}). Using base image: {base_image}")
+    existing_paths, (_, compose_found) = asyncio.run(
+        _pull_and_scan_website_paths(base_image, check_wsl_if_windows, docker_compose_available))
+    check_docker_compose(compose_found)
+    build_and_run_readonly_container(base_image, existing_paths)
+
+def option_pull_docker():
+    """Option 2: Only pull the Docker image matching the host OS."""
+    check_all_dependencies()
+    os_name, version, base_image = host_base_image()
+    print(f"[INFO] Detected OS: {os_name} (Version: {version}). Base image: {base_image}")
+    pull_docker_image(base_image)
+
+def option_copy_website_files():
+    """Option 3: Copy the host website-related files into an existing container."""
+    check_all_dependencies()
+    container_id = input("Enter the name or ID of the target container: ").strip()
+    if not container_id:
+        print("[ERROR] No container given.")
+        return
+
+    paths = existing_website_paths()
+    for path in _WEBSITE_PATHS:
+        if path not in paths:
+            print(f"[WARN] '{path}' does not exist. Skipping.")
+    if not paths:
+        return
+
+    # One tar stream into one 'docker cp', instead of a docker CLI process per path.
+    # Archive names are relative to '/', so everything lands at the same path in the container.
+    print(f"[INFO] Copying {len(paths)} path(s) into '{container_id}'.")
+    cp_argv = [shutil.which("docker") or "docker", "cp", "-", f"{container_id}:/"]
+    tar_argv = gnu_tar_create_argv(paths)
+    if tar_argv:
+        # Pipe the tar binary straight into docker cp; Python never touches the data.
+        tar_proc = subprocess.Popen(tar_argv, stdout=subprocess.PIPE)
+        proc = subprocess.Popen(cp_argv, stdin=tar_proc.stdout, close_fds=False)
+        tar_proc.stdout.close()
+        returncode = proc.wait()
+        # docker cp can exit 0 on a stream that tar cut short.
+        tar_ok = report_gnu_tar_status(tar_proc.wait())
+    else:
+        proc = subprocess.Popen(cp_argv, stdin=subprocess.PIPE, close_fds=False)
+        returncode = stream_paths_as_tar(proc, paths, "docker cp process")
+        tar_ok = True
+    if returncode == 0 and tar_ok:
+        print(f"[INFO] Website files copied into '{container_id}'.")
+    elif returncode == 0:
+        print(f"[ERROR] The website files copied into '{container_id}' are incomplete.")
+    else:
+        print(f"[ERROR] 'docker cp' into '{container_id}' failed (exit code {returncode}).")
+
+@functools.lru_cache(maxsize=1)
+def _have_sudo():
+    """Return True if sudo is on PATH (cached; the answer can't change mid-run)."""
+    return shutil.which("sudo") is not None
+
 def get_sudo_prefix():
     """Return sudo prefix if available, else an empty list."""
-    return ["sudo"] if shutil.which("sudo") else []
+    # A fresh list each call, so callers may extend it freely.
+    return ["sudo"] if _have_sudo() else []
+
+# Shell command that uninstalls Docker, per package manager ({pm} is the manager's name).
+_PM_REMOVE_CMDS = {
+    "apt": "{pm} remove -y docker.io docker-ce docker-ce-cli containerd.io && {pm} autoremove -y",
+    "apt-get": "{pm} remove -y docker.io docker-ce docker-ce-cli containerd.io && {pm} autoremove -y",
+    "yum": "{pm} remove -y docker",
+    "dnf": "{pm} remove -y docker",
+    "zypper": "zypper --non-interactive remove docker",
+}
+# Package-managed docker-compose; anywhere else it's a standalone binary.
+_PM_REMOVE_COMPOSE_CMDS = {
+    "apt": "{pm} remove -y docker-compose && {pm} autoremove -y",
+    "apt-get": "{pm} remove -y docker-compose && {pm} autoremove -y",
+}
+
+_PURGE_STATUS_MARKER = "__CCDC_PURGE_STEP_STATUS__"
 
 def option_purge_docker():
     """
@@ -1226,58 +1900,103 @@ def option_purge_docker():
         return
 
     try:
-        print("[INFO] Stopping all running Docker containers...")
-        subprocess.run("docker kill $(docker ps -q)", shell=True, check=False)
-        print("[INFO] Removing all Docker containers...")
-        subprocess.run("docker rm -f $(docker ps -aq)", shell=True, check=False)
+        # 'rm -f' stops running containers itself, so one listing and one removal cover both.
+        print("[INFO] Stopping and removing all Docker containers...")
+        container_ids = subprocess.check_output(["docker", "ps", "-aq"]).split()
+        if container_ids:
+            subprocess.run(["docker", "rm", "-f", *container_ids], check=False)
         print("[INFO] Pruning Docker system (images, volumes, networks)...")
         subprocess.check_call(["docker", "system", "prune", "-a", "--volumes", "-f"])
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Docker cleanup failed: {e}")
 
-    if platform.system().lower().startswith("linux"):
+    if _PLATFORM == "linux":
         pm = detect_linux_package_manager()
         sudo_prefix = get_sudo_prefix()
-        if pm:
-            try:
-                print(f"[INFO] Removing Docker using {pm}...")
-                if pm in ("apt", "apt-get"):
-                    subprocess.check_call(sudo_prefix + [pm, "remove", "-y", "docker.io", "docker-ce", "docker-ce-cli", "containerd.io"])
-                    subprocess.check_call(sudo_prefix + [pm, "autoremove", "-y"])
-                elif pm in ("yum", "dnf"):
-                    subprocess.check_call(sudo_prefix + [pm, "remove", "-y", "docker"])
-                elif pm == "zypper":
-                    subprocess.check_call(sudo_prefix + ["zypper", "--non-interactive", "remove", "docker"])
-            except subprocess.CalledProcessError as e:
-                print(f"[ERROR] Failed to remove Docker via package manager: {e}")
+        # (message, shell command, failure message) for each removal step.
+        steps = []
+        remove_cmd = _PM_REMOVE_CMDS.get(pm)
+        if remove_cmd:
+            steps.append((f"[INFO] Removing Docker using {pm}...", remove_cmd.format(pm=pm),
+                          "[ERROR] Failed to remove Docker via package manager"))
         else:
             print("[WARN] No supported package manager found to remove Docker.")
 
-        try:
+        compose_path = shutil.which("docker-compose")
+        compose_cmd = _PM_REMOVE_COMPOSE_CMDS.get(pm)
+        if compose_path and compose_cmd:
+            steps.append(("[INFO] Removing Docker Compose...", compose_cmd.format(pm=pm),
+                          "[ERROR] Failed to remove Docker Compose"))
+        elif compose_path:
+            # A standalone binary: unlink it directly, and only go through sudo if we must.
             print("[INFO] Removing Docker Compose...")
-            if shutil.which("docker-compose"):
-                if pm and pm in ("apt", "apt-get"):
-                    subprocess.check_call(sudo_prefix + [pm, "remove", "-y", "docker-compose"])
-                    subprocess.check_call(sudo_prefix + [pm, "autoremove", "-y"])
-                else:
-                    subprocess.check_call(sudo_prefix + ["rm", "-f", "$(which docker-compose)"], shell=True)
-        except subprocess.CalledProcessError as e:
-            print(f"[ERROR] Failed to remove Docker Compose: {e}")
+            try:
+                os.unlink(compose_path)
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                steps.append(("[INFO] Retrying Docker Compose removal with elevated rights...",
+                              f"rm -f {shlex.quote(compose_path)}",
+                              "[ERROR] Failed to remove Docker Compose"))
 
         docker_dirs = ["/var/lib/docker", "/etc/docker", "/var/run/docker", "/var/log/docker"]
-        for d in docker_dirs:
-            if os.path.exists(d):
+        # Already root: remove the directories in-process after the shell steps
+        # instead of handing 'rm -rf' to it.
+        need_sudo = os.geteuid() != 0
+        # lexists: a dangling symlink still needs removing, and there's no target to stat.
+        existing_dirs = [d for d in docker_dirs if os.path.lexists(d)]
+        if need_sudo and existing_dirs:
+            listed = ", ".join(existing_dirs)
+            steps.append((f"[INFO] Removing directories {listed}...",
+                          "rm -rf -- " + " ".join(shlex.quote(d) for d in existing_dirs),
+                          f"[ERROR] Failed to remove {listed}"))
+        try:
+            grp.getgrnam("docker")
+        except KeyError:
+            print("[INFO] No docker group to remove.")
+        else:
+            steps.append(("[INFO] Removing docker group...", "groupdel docker",
+                          "[WARN] Docker group could not be removed"))
+
+        # Run every step in one privileged shell rather than a sudo process per command.
+        # After each step the shell prints a marker line with the step's exit status on
+        # its stdout, which is relayed here, so failures are still reported step by step.
+        # (A status file can't be used: root may not write a user's file in sticky /tmp.)
+        script = "\n".join(
+            f"echo {shlex.quote(message)}; {{ {cmd}; }}; echo \"{_PURGE_STATUS_MARKER} {i} $?\""
+            for i, (message, cmd, _) in enumerate(steps)
+        )
+        statuses = {}
+        if steps:
+            marker = _PURGE_STATUS_MARKER.encode()
+            proc = subprocess.Popen(sudo_prefix + ["sh", "-c", script], stdout=subprocess.PIPE)
+            for line in proc.stdout:
+                pos = line.find(marker)
+                if pos < 0:
+                    sys.stdout.buffer.write(line)
+                else:
+                    # A step's last output line may lack a newline, leaving the marker mid-line.
+                    if pos:
+                        sys.stdout.buffer.write(line[:pos] + b"\n")
+                    fields = line[pos:].split()
+                    if len(fields) == 3:
+                        statuses[fields[1].decode()] = fields[2].decode()
+                sys.stdout.flush()
+            proc.wait()
+        for i, (_, _, failure) in enumerate(steps):
+            code = statuses.get(str(i))
+            if code != "0":
+                print(f"{failure}: exit status {code or 'unknown'}.")
+        if not need_sudo:
+            for d in existing_dirs:
+                print(f"[INFO] Removing directory {d}...")
                 try:
-                    print(f"[INFO] Removing directory {d}...")
-                    subprocess.check_call(sudo_prefix + ["rm", "-rf", d])
-                except subprocess.CalledProcessError as e:
+                    if os.path.islink(d):
+                        os.unlink(d)
+                    else:
+                        shutil.rmtree(d)
+                except OSError as e:
                     print(f"[ERROR] Failed to remove {d}: {e}")
-
-        try:
-            print("[INFO] Removing docker group...")
-            subprocess.check_call(sudo_prefix + ["groupdel", "docker"], stderr=subprocess.DEVNULL)
-        except subprocess.CalledProcessError:
-            print("[WARN] Docker group could not be removed (it may not exist).")
     else:
         print("[WARN] Purge operation is only fully supported on Linux. Please manually purge Docker on your system if needed.")
 
@@ -1305,11 +2024,11 @@ def interactive_menu():
         print("6: Exit")
         choice = input("Enter your choice: ").strip()
         if choice == "1":
-            option_comprehensive()          # assuming this function is defined elsewhere
+            option_comprehensive()
         elif choice == "2":
-            option_pull_docker()            # assuming this function is defined elsewhere
+            option_pull_docker()
         elif choice == "3":
-            option_copy_website_files()     # assuming this function is defined elsewhere
+            option_copy_website_files()
         elif choice == "4":
             option_setup_modsecurity()      # new modsecurity setup option
         elif choice == "5":
@@ -1322,17 +2041,36 @@ def interactive_menu():
 
 
 
+# Non-interactive actions, in menu order; several can be chained in one run.
+_ACTIONS = {
+    "comprehensive": option_comprehensive,
+    "pull": option_pull_docker,
+    "copy": option_copy_website_files,
+    "modsecurity": option_setup_modsecurity,
+    "purge": option_purge_docker,
+}
+
 def main():
     parser = argparse.ArgumentParser(
-        description="CCDC OS-to-Container & Integrity Tool with skipping missing dirs, Docker Compose auto-install, forced noninteractive, etc."
+        description="CCDC OS-to-Container & Integrity Tool with skipping missing dirs, Docker Compose auto-install, forced noninteractive, etc.",
+        epilog="Actions run in order in a single process, e.g. 'pull copy' instead of two separate invocations."
     )
     parser.add_argument("--menu", action="store_true", help="Launch interactive menu")
+    parser.add_argument("actions", nargs="*", metavar="ACTION",
+                        help=f"Run without the menu: {', '.join(_ACTIONS)}")
     args = parser.parse_args()
-    if args.menu:
+    unknown = [a for a in args.actions if a not in _ACTIONS]
+    if unknown:
+        parser.error(f"unknown action(s): {', '.join(unknown)} (choose from {', '.join(_ACTIONS)})")
+    if args.menu or (not args.actions and sys.stdin.isatty()):
         interactive_menu()
-    else:
-        print("Usage: Run the script with '--menu' to launch the interactive menu.")
+    elif not args.actions:
+        print("Usage: Run the script with '--menu' (or from a terminal) for the interactive menu, "
+              f"or name one or more actions: {', '.join(_ACTIONS)}.")
         sys.exit(0)
+    else:
+        for action in args.actions:
+            _ACTIONS[action]()
 
 if __name__ == "__main__":
     main()